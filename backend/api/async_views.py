@@ -0,0 +1,48 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .views import RecipeViewSet
+
+
+def _run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        # Рендеринг JSON тоже выполняем в потоке, а не в event loop.
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def threaded(view):
+    """Асинхронная обёртка над синхронной DRF-вью.
+
+    Django 3.2 выполняет синхронные вью под ASGI в одном общем потоке,
+    поэтому медленная выгрузка или загрузка картинки блокирует все
+    остальные запросы. Обёртка выполняет вью в пуле потоков, у каждого
+    потока своё соединение с базой.
+    """
+    run = sync_to_async(_run_view, thread_sensitive=False)
+
+    async def async_view(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+recipe_list = threaded(RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'},
+    basename='recipes', detail=False
+))
+recipe_detail = threaded(RecipeViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update',
+     'patch': 'partial_update', 'delete': 'destroy'},
+    basename='recipes', detail=True
+))
+download_shopping_cart = threaded(RecipeViewSet.as_view(
+    {'get': 'download_shopping_cart'},
+    basename='recipes', **RecipeViewSet.download_shopping_cart.kwargs
+))
@@ -0,0 +1,175 @@
+import pickle
+from collections import Counter, OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram.metrics import count_cache
+
+SHARED_KEY = 'auth:token:{digest}'
+REVOKED_KEY = 'auth:token:revoked:{digest}'
+
+_stats = Counter()
+_lock = Lock()
+
+
+def _inc(name):
+    with _lock:
+        _stats[name] += 1
+    count_cache('token', name)
+
+
+class LocalTokenCache:
+    """LRU воркера с ограниченным временем жизни записей.
+
+    Хранит токены в pickle, чтобы параллельные запросы не делили один
+    экземпляр пользователя, вместе с отметкой отзыва на момент записи.
+    """
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, user_id, value = item
+            if expires < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, user_id, value):
+        if settings.TOKEN_CACHE_TTL <= 0 or settings.TOKEN_CACHE_SIZE <= 0:
+            return
+        with self._lock:
+            self._data[key] = (
+                monotonic() + settings.TOKEN_CACHE_TTL, user_id, value
+            )
+            self._data.move_to_end(key)
+            while len(self._data) > settings.TOKEN_CACHE_SIZE:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (_, owner, _) in self._data.items()
+                        if owner == user_id]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LocalTokenCache()
+
+
+def shared_key(key, template=SHARED_KEY):
+    # Сам токен в ключ общего кэша не попадает.
+    return template.format(digest=sha256(key.encode()).hexdigest())
+
+
+def revoked_key(key):
+    return shared_key(key, REVOKED_KEY)
+
+
+def token_cache_stats():
+    """Попадания в кэш токенов текущего воркера."""
+    with _lock:
+        stats = {name: _stats[name] for name in
+                 ('local_hit', 'shared_hit', 'miss', 'invalidated')}
+    lookups = stats['local_hit'] + stats['shared_hit'] + stats['miss']
+    stats['hit_rate'] = (
+        round((lookups - stats['miss']) / lookups, 4) if lookups else None
+    )
+    return stats
+
+
+def invalidate_tokens(keys, user_id=None):
+    """Сбросить токены в этом воркере и в общем кэше.
+
+    Новая отметка отзыва не совпадёт с отметкой, сохранённой в записях
+    LRU и общего кэша, и токен перечитается из базы. Отметка живёт
+    дольше записей обоих кэшей.
+    """
+    for key in keys:
+        local_tokens.delete(key)
+        _inc('invalidated')
+    if user_id is not None:
+        local_tokens.delete_user(user_id)
+    if settings.TOKEN_CACHE_SHARED and keys:
+        cache.delete_many([shared_key(key) for key in keys])
+        cache.set_many(
+            {revoked_key(key): uuid4().hex for key in keys},
+            max(settings.TOKEN_CACHE_TTL, settings.TOKEN_CACHE_SHARED_TTL) + 1
+        )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кэшем токен -> пользователь.
+
+    Сначала ищет в LRU воркера, затем в общем кэше Django
+    (TOKEN_CACHE_SHARED), и только потом в базе. Запись LRU действует,
+    пока отметка отзыва токена в общем кэше не изменилась, поэтому
+    выход и деактивация сразу действуют во всех воркерах. Без общего
+    кэша отметки негде хранить, и токены всегда читаются из базы.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_SHARED:
+            _inc('miss')
+            return super().authenticate_credentials(key)
+        # Обе записи хранят отметку, прочитанную до базы: отзыв во время
+        # чтения сменит её, и следующая проверка не примет устаревшую
+        # запись ни из LRU, ни из общего кэша.
+        revoked = cache.get(revoked_key(key))
+        item = local_tokens.get(key)
+        if item is not None and item[0] == revoked:
+            _inc('local_hit')
+            token = pickle.loads(item[1])
+            return token.user, token
+        item = cache.get(shared_key(key))
+        if item is not None and item[0] == revoked:
+            _inc('shared_hit')
+            token = pickle.loads(item[1])
+            local_tokens.set(key, token.user_id, item)
+            return token.user, token
+        _inc('miss')
+        user, token = super().authenticate_credentials(key)
+        item = (revoked, pickle.dumps(token))
+        local_tokens.set(key, user.pk, item)
+        cache.set(shared_key(key), item, settings.TOKEN_CACHE_SHARED_TTL)
+        return user, token
+
+
+def token_deleted(sender, instance, **kwargs):
+    key, user_id = instance.key, instance.user_id
+    transaction.on_commit(lambda: invalidate_tokens([key], user_id))
+
+
+def user_changed(sender, instance, created=False, update_fields=None,
+                 **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if created or (update_fields is not None
+                   and set(update_fields) == {'last_login'}):
+        return
+    user_id = instance.pk
+    keys = list(Token.objects.filter(user=user_id).values_list(
+        'key', flat=True
+    ))
+
+    transaction.on_commit(lambda: invalidate_tokens(keys, user_id))
@@ -0,0 +1,52 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from foodgram.metrics import count_cache
+from recipes.cache import get_recipes_version
+
+ANONYMOUS_LIST_KEY = 'recipes:list:{version}:{digest}'
+
+
+def normalized_query(request):
+    """Параметры запроса в каноническом виде: порядок не важен."""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values if value != ''
+    )
+    # Ссылки next/previous и картинки абсолютные, поэтому учитываем хост.
+    return f'{request.scheme}://{request.get_host()}?{params!r}'
+
+
+def anonymous_list_key(request):
+    digest = md5(normalized_query(request).encode()).hexdigest()
+    return ANONYMOUS_LIST_KEY.format(
+        version=get_recipes_version(), digest=digest
+    )
+
+
+class AnonymousListCacheMixin:
+    """Кэш ответа list для анонимных пользователей.
+
+    Для анонима ответ не зависит от пользователя, поэтому одинаковые
+    запросы обслуживаются из кэша. Ключ содержит версию данных рецептов,
+    которую сбрасывают изменения рецептов, тегов и ингредиентов.
+    Работает при RECIPES_CACHE.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPES_CACHE or request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        key = anonymous_list_key(request)
+        data = cache.get(key)
+        if data is not None:
+            count_cache('recipe_list', 'hit')
+            return Response(data)
+        count_cache('recipe_list', 'miss')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPES_CACHE_TIMEOUT)
+        return response
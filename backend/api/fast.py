@@ -0,0 +1,173 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from rest_framework.response import Response
+
+from recipes.models import IngredientToRecipe, Recipe, TagToRecipe
+from users.models import Follow, User
+
+# Быстрое чтение для горячих списков: строки выбираются через values(),
+# связанные данные — словарями по id, ответ собирается из dict без
+# экземпляров моделей и полей сериализаторов. JSON совпадает с выводом
+# RecipeReadSerializer, IngredientSerializer и SubscribeListSerializer.
+
+RECIPE_COLUMNS = ('id', 'name', 'cooking_time', 'image', 'author_id', 'text')
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+AUTHOR_COLUMNS = ('username', 'email', 'id', 'first_name', 'last_name')
+SUBSCRIPTION_COLUMNS = ('email', 'id', 'username', 'first_name',
+                        'last_name')
+SHORT_RECIPE_COLUMNS = ('name', 'id', 'cooking_time', 'image')
+INGREDIENT_COLUMNS = ('id', 'name', 'measurement_unit')
+
+
+def recipe_values(queryset, fields=None):
+    """values() со столбцами рецепта и аннотациями пользователя."""
+    flags = [flag for flag in USER_FLAGS if flag in queryset.query.annotations]
+    columns = [column for column in RECIPE_COLUMNS
+               if column != 'text' or fields is None or 'text' in fields]
+    return queryset.prefetch_related(None).values(*columns, *flags)
+
+
+def image_url(request, name):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def followed_authors(request, author_ids):
+    user = request.user if request is not None else None
+    if user is None or not user.is_authenticated:
+        return set()
+    return set(Follow.objects.filter(
+        user=user, author__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def recipe_tags(recipe_ids):
+    tags = defaultdict(list)
+    rows = TagToRecipe.objects.filter(recipe__in=recipe_ids).order_by(
+        'tag__name'
+    ).values_list('recipe_id', 'tag__id', 'tag__name', 'tag__color',
+                  'tag__slug')
+    for recipe_id, pk, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': pk, 'name': name, 'color': color, 'slug': slug}
+        )
+    return tags
+
+
+def recipe_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    rows = IngredientToRecipe.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__id', 'ingredient__name',
+                  'ingredient__measurement_unit', 'amount')
+    for recipe_id, pk, name, unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': pk, 'name': name,
+            'measurement_unit': unit, 'amount': amount,
+        })
+    return ingredients
+
+
+def selected(fields, name):
+    return fields is None or name in fields
+
+
+def recipes(rows, request, fields=None):
+    """Рецепты в формате RecipeReadSerializer из строк recipe_values.
+
+    fields — поля, выбранные параметрами fields и omit; None — все.
+    """
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    author_ids = {row['author_id'] for row in rows}
+    tags_by_recipe = (recipe_tags(recipe_ids) if selected(fields, 'tags')
+                      else defaultdict(list))
+    ingredients_by_recipe = (
+        recipe_ingredients(recipe_ids) if selected(fields, 'ingredients')
+        else defaultdict(list)
+    )
+    authors, subscribed = {}, set()
+    if selected(fields, 'author'):
+        authors = {
+            author['id']: author for author in
+            User.objects.filter(id__in=author_ids).values(*AUTHOR_COLUMNS)
+        }
+        subscribed = followed_authors(request, author_ids)
+    is_authenticated = (request is not None
+                        and request.user.is_authenticated)
+    data = []
+    for row in rows:
+        author = authors.get(row['author_id'])
+        if author is not None:
+            author = dict(author)
+            author['is_subscribed'] = (
+                is_authenticated and row['author_id'] in subscribed
+            )
+        item = {
+            'id': row['id'],
+            'name': row['name'],
+            'tags': tags_by_recipe[row['id']],
+            'ingredients': ingredients_by_recipe[row['id']],
+            'cooking_time': row['cooking_time'],
+            'image': image_url(request, row['image']),
+            'author': author,
+        }
+        for flag in USER_FLAGS:
+            if flag in row:
+                item[flag] = bool(row[flag])
+        item['text'] = row.get('text')
+        if fields is not None:
+            item = {field: item[field] for field in fields if field in item}
+        data.append(item)
+    return data
+
+
+def ingredients(queryset):
+    return list(queryset.values(*INGREDIENT_COLUMNS))
+
+
+def subscriptions(rows, request, fields=None):
+    """Подписки в формате SubscribeListSerializer."""
+    rows = list(rows)
+    author_ids = [row['id'] for row in rows]
+    short_recipes = defaultdict(list)
+    if selected(fields, 'recipes') or selected(fields, 'recipes_count'):
+        for row in Recipe.objects.filter(author__in=author_ids).values(
+            'author_id', *SHORT_RECIPE_COLUMNS
+        ):
+            short_recipes[row.pop('author_id')].append(row)
+    subscribed = followed_authors(request, author_ids)
+    is_authenticated = request.user.is_authenticated
+    data = []
+    for row in rows:
+        author_recipes = short_recipes[row['id']]
+        for recipe in author_recipes:
+            recipe['image'] = image_url(request, recipe['image'])
+        item = dict(row)
+        item['recipes'] = author_recipes
+        item['recipes_count'] = len(author_recipes)
+        item['is_subscribed'] = is_authenticated and row['id'] in subscribed
+        if fields is not None:
+            item = {field: item[field] for field in fields}
+        data.append(item)
+    return data
+
+
+class FastRecipeListMixin:
+    """Список рецептов через values(), включается API_FAST_READ."""
+
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_READ:
+            return super().list(request, *args, **kwargs)
+        fields = self.get_sparse_fields()
+        rows = recipe_values(
+            self.filter_queryset(self.get_queryset()), fields
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(recipes(rows, request, fields))
+        return self.get_paginated_response(recipes(page, request, fields))
@@ -1,5 +1,12 @@
+from django.db import connections
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters, CharFilter
-from recipes.models import Recipe, Tag, Ingredient
+from recipes.models import (Recipe, Tag, Ingredient, IngredientToRecipe,
+                            TagToRecipe)
+
+TAGS_ANY = 'any'
+TAGS_ALL = 'all'
+LINK_MODELS = {'tag': TagToRecipe, 'ingredient': IngredientToRecipe}
 
 
 class IngredientFilter(FilterSet):
@@ -10,11 +17,56 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+def with_any(name, ids):
+    """EXISTS по связям рецепта: рецепт попадает один раз."""
+    return Exists(LINK_MODELS[name].objects.filter(
+        recipe=OuterRef('pk'), **{f'{name}__in': ids}
+    ))
+
+
+def with_all(name, ids):
+    """id рецептов со всеми ids: одна группировка по связям вместо
+    EXISTS на каждое значение. Пара связи с рецептом уникальна, поэтому
+    число связей равно числу найденных значений."""
+    return LINK_MODELS[name].objects.filter(**{f'{name}__in': ids}).values(
+        'recipe'
+    ).annotate(found=Count('id')).filter(found=len(ids)).values('recipe')
+
+
+def filter_links(queryset, name, ids, match_all):
+    """Рецепты с любым или со всеми тегами (ингредиентами) ids.
+
+    В PostgreSQL — по спискам в столбцах рецепта с GIN-индексом, без
+    JOIN. В SQLite списки хранятся в JSON без индекса, поэтому там
+    быстрее полусоединение со связями по их индексам.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        lookup = 'contains' if match_all else 'overlap'
+        return queryset.filter(**{f'{name}_ids__{lookup}': ids})
+    if match_all:
+        return queryset.filter(pk__in=with_all(name, ids))
+    return queryset.filter(with_any(name, ids))
+
+
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    # any — рецепты хотя бы с одним из тегов, all — со всеми.
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_ANY, TAGS_ANY), (TAGS_ALL, TAGS_ALL)),
+        method='filter_tags_mode',
+    )
+    # Рецепты со всеми указанными ингредиентами.
+    ingredients = filters.ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_ingredients',
+    )
+    max_ingredients = filters.NumberFilter(
+        field_name='ingredients_count', lookup_expr='lte'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -23,7 +75,27 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = ('tags', 'tags_mode', 'author', 'ingredients',
+                  'max_ingredients', 'is_favorited', 'is_in_shopping_cart',)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return filter_links(
+            queryset, 'tag', sorted({tag.pk for tag in value}),
+            self.form.cleaned_data.get('tags_mode') == TAGS_ALL
+        )
+
+    def filter_tags_mode(self, queryset, name, value):
+        # Режим учитывает filter_tags.
+        return queryset
+
+    def filter_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return filter_links(queryset, 'ingredient',
+                            sorted({ingredient.pk for ingredient in value}),
+                            True)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
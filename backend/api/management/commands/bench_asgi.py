@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = {
+    'wsgi': ['gunicorn', 'foodgram.wsgi:application'],
+    'asgi': ['gunicorn', 'foodgram.asgi:application',
+             '-k', 'uvicorn.workers.UvicornWorker'],
+}
+DEFAULT_PATHS = ('/api/recipes/', '/api/recipes/download_shopping_cart/')
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности WSGI и ASGI развёртываний.
+
+    Поднимает gunicorn с синхронными воркерами и с воркерами uvicorn
+    на одной базе и нагружает их одинаковым числом параллельных
+    клиентов.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--port', type=int, default=8500)
+        parser.add_argument('--token', help='Токен для авторизованных '
+                                            'эндпоинтов.')
+        parser.add_argument('--path', action='append', dest='paths')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        for offset, (name, command) in enumerate(SERVERS.items()):
+            port = options['port'] + offset
+            server = self.start(command, port, options['workers'])
+            try:
+                rps, latencies, errors = self.load(
+                    f'http://127.0.0.1:{port}', paths, headers, options
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            p50, p95 = self.percentiles(latencies)
+            self.stdout.write(
+                f'{name}: {rps:8.1f} запр/с  p50 {p50:7.1f} мс  '
+                f'p95 {p95:7.1f} мс  ошибок {errors}'
+            )
+
+    def start(self, command, port, workers):
+        server = subprocess.Popen(
+            [*command, '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers), '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=os.environ.copy(),
+            stdout=subprocess.DEVNULL, stderr=sys.stderr,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                urlopen(f'http://127.0.0.1:{port}/api/tags/', timeout=1)
+                return server
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'Сервер {command[1]} не запустился.')
+
+    def load(self, base_url, paths, headers, options):
+        def fetch(number):
+            url = base_url + paths[number % len(paths)]
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers), timeout=60) as r:
+                    r.read()
+                ok = True
+            except (URLError, ConnectionError):
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        latencies = [latency for latency, ok in results if ok]
+        return (len(results) / elapsed, latencies,
+                len(results) - len(latencies))
+
+    @staticmethod
+    def percentiles(latencies):
+        if len(latencies) < 2:
+            return 0.0, 0.0
+        cuts = quantiles(latencies, n=100)
+        return cuts[49] * 1000, cuts[94] * 1000
@@ -0,0 +1,78 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from api.management.seed import seed
+from api.renderers import FastJSONRenderer, orjson
+from foodgram.compression import brotli, compress
+
+SEED_PREFIX = 'bench_json'
+
+
+class Rollback(Exception):
+    """Откат тестовых данных после замеров."""
+
+
+class Command(BaseCommand):
+    """Рендеринг и сжатие типичных страниц рецептов.
+
+    Для страниц разного размера печатает число рендеров в секунду
+    стандартным JSONRenderer и FastJSONRenderer, размер ответа и
+    скорость сжатия gzip и brotli.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--limit', type=int, action='append',
+                            dest='limits')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write('orjson не установлен: FastJSONRenderer '
+                              'работает через json.')
+        try:
+            with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver'], RESPONSE_COMPRESSION=False
+            ):
+                self.bench(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def bench(self, options):
+        seed(SEED_PREFIX, options['recipes'])
+        client = Client()
+        renderers = (('json', JSONRenderer()), ('orjson', FastJSONRenderer()))
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        for limit in options['limits'] or (6, 50):
+            data = client.get(
+                '/api/recipes/', {'limit': limit}
+            ).data
+            self.stdout.write(f'Страница из {limit} рецептов:')
+            for name, renderer in renderers:
+                content = renderer.render(data)
+                rate = self.rate(lambda: renderer.render(data), options)
+                self.stdout.write(
+                    f'  {name:<8} {rate:>9.0f} стр/с  '
+                    f'{len(content) / 1024:>7.1f} КБ'
+                )
+            for encoding in encodings:
+                rate = self.rate(lambda: compress(content, encoding),
+                                 options)
+                size = len(compress(content, encoding))
+                self.stdout.write(
+                    f'  {encoding:<8} {rate:>9.0f} стр/с  '
+                    f'{size / 1024:>7.1f} КБ'
+                )
+
+    @staticmethod
+    def rate(func, options):
+        start = perf_counter()
+        for _ in range(options['repeat']):
+            func()
+        return options['repeat'] / (perf_counter() - start)
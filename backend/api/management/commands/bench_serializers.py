@@ -0,0 +1,107 @@
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import fast
+from api.management.seed import seed
+from api.serializers import (IngredientSerializer, RecipeReadSerializer,
+                             SubscribeListSerializer)
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+SEED_PREFIX = 'bench_serializers'
+
+
+class Rollback(Exception):
+    """Откат тестовых данных после замеров."""
+
+
+class Command(BaseCommand):
+    """Строк в секунду: сериализаторы DRF против чтения через values()."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver']
+            ):
+                self.bench(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def bench(self, options):
+        reader = seed(SEED_PREFIX, options['recipes'])
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = reader
+        context = {'request': request}
+        limit = options['limit']
+
+        def recipes():
+            return Recipe.objects.with_user_annotations(reader).order_by(
+                'name', 'id'
+            )[:limit]
+
+        def plain_recipes():
+            queryset = recipes().select_related('author').prefetch_related(
+                'tags', 'ingredient_recipe__ingredient'
+            )
+            return serializers.ListSerializer(
+                queryset, child=RecipeReadSerializer(), context=context
+            ).data
+
+        cache.clear()
+        RecipeReadSerializer(recipes(), many=True, context=context).data
+        subscriptions = User.objects.filter(followers__user=reader)
+
+        def plain_ingredients():
+            return IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data
+
+        def plain_subscriptions():
+            return SubscribeListSerializer(
+                subscriptions, many=True, context=context
+            ).data
+
+        def fast_subscriptions():
+            return fast.subscriptions(
+                subscriptions.values(*fast.SUBSCRIPTION_COLUMNS), request
+            )
+
+        ingredients = Ingredient.objects.count()
+        cases = (
+            ('рецепты, сериализатор', limit, plain_recipes),
+            ('рецепты, кэш фрагментов', limit, lambda: RecipeReadSerializer(
+                recipes(), many=True, context=context
+            ).data),
+            ('рецепты, values()', limit, lambda: fast.recipes(
+                fast.recipe_values(recipes()), request
+            )),
+            ('ингредиенты, сериализатор', ingredients, plain_ingredients),
+            ('ингредиенты, values()', ingredients,
+             lambda: fast.ingredients(Ingredient.objects.all())),
+            ('подписки, сериализатор', subscriptions.count(),
+             plain_subscriptions),
+            ('подписки, values()', subscriptions.count(),
+             fast_subscriptions),
+        )
+        for title, rows, func in cases:
+            start = perf_counter()
+            for _ in range(options['repeat']):
+                func()
+            elapsed = perf_counter() - start
+            self.stdout.write(
+                f'{title:<28} {rows * options["repeat"] / elapsed:>10.0f}'
+                ' строк/с'
+            )
@@ -0,0 +1,133 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+from statistics import median, quantiles
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ('/api/tags/', '/api/ingredients/?name=к',
+                 '/api/recipes/?page=1&limit=6',
+                 '/api/recipes/?page=2&limit=6', '/api/users/')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \| \s*(\S+)')
+
+# Выполняется в отдельном интерпретаторе: импорт с нуля, как у воркера.
+PROBE = '''
+import json, sys, time
+options = json.loads(sys.argv[1])
+start = time.perf_counter()
+from foodgram.wsgi import application
+from foodgram.warmup import call, warm_up
+result = {'import': time.perf_counter() - start, 'warm_up': {},
+          'first': {}, 'steady': {}, 'status': {}}
+if options['warm']:
+    result['warm_up'] = warm_up(application)
+headers = {}
+if options['token']:
+    headers['HTTP_AUTHORIZATION'] = 'Token ' + options['token']
+for path in options['paths']:
+    latencies = []
+    for _ in range(options['repeat'] + 1):
+        start = time.perf_counter()
+        result['status'][path] = call(application, path, headers=headers)
+        latencies.append(time.perf_counter() - start)
+    result['first'][path] = latencies[0]
+    steady = sorted(latencies[1:] or latencies)
+    result['steady'][path] = steady[len(steady) // 2]
+print(json.dumps(result))
+'''
+IMPORT_PROBE = ('from foodgram.wsgi import application\n'
+                'from foodgram.warmup import load_code\n'
+                'load_code()')
+
+
+class Command(BaseCommand):
+    """Время запуска воркера и первых запросов без прогрева и с ним.
+
+    Каждый прогон — новый интерпретатор: импорт foodgram.wsgi, затем
+    в режиме warm прогрев foodgram.warmup.warm_up, затем запросы
+    к приложению в обход сети: первый к каждому пути и --repeat
+    повторных. Итог — медианы по --runs прогонам, время до первого
+    ответа и p99 первых запросов. --top показывает пакеты, дольше всех
+    импортируемых воркером (python -X importtime).
+
+    Под locmem кэш у каждого прогона свой, как у нового воркера; с общим
+    кэшем (file, redis) холодные прогоны попадут в кэш, прогретый
+    предыдущими.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Повторных запросов к каждому пути.')
+        parser.add_argument('--path', action='append', dest='paths')
+        parser.add_argument('--token', help='Токен для запросов.')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Сколько пакетов показать; 0 — не '
+                                 'замерять импорт.')
+
+    def handle(self, *args, **options):
+        if options['top']:
+            self.import_times(options['top'])
+        paths = options['paths'] or DEFAULT_PATHS
+        for mode in ('cold', 'warm'):
+            runs = [self.run({
+                'warm': mode == 'warm', 'paths': paths,
+                'repeat': options['repeat'], 'token': options['token'],
+            }) for _ in range(options['runs'])]
+            self.report(mode, runs, paths)
+
+    def python(self, *args):
+        completed = subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR,
+            env=os.environ.copy(), capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(completed.stderr.strip().splitlines()[-1])
+        return completed
+
+    def run(self, options):
+        completed = self.python('-c', PROBE, json.dumps(options))
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def import_times(self, top):
+        """Собственное время импорта модулей по пакетам верхнего уровня."""
+        completed = self.python('-X', 'importtime', '-c', IMPORT_PROBE)
+        packages = Counter()
+        for line in completed.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                packages[match[2].split('.')[0]] += int(match[1])
+        self.stdout.write(
+            f'Импорт foodgram.wsgi и URLconf: '
+            f'{sum(packages.values()) / 1000:.0f} мс, дольше всех:'
+        )
+        for package, microseconds in packages.most_common(top):
+            self.stdout.write(f'  {package:<28}{microseconds / 1000:8.1f} мс')
+
+    def report(self, mode, runs, paths):
+        def ms(values):
+            return median(values) * 1000
+
+        warm_up = [sum(run['warm_up'].values()) for run in runs]
+        to_first = [run['import'] + sum(run['warm_up'].values())
+                    + run['first'][paths[0]] for run in runs]
+        firsts = [run['first'][path] for run in runs for path in paths]
+        p99 = (quantiles(firsts, n=100)[98] if len(firsts) > 1
+               else firsts[0]) * 1000
+        self.stdout.write(
+            f'\n{mode}: импорт {ms([run["import"] for run in runs]):.0f} мс, '
+            f'прогрев {ms(warm_up):.0f} мс, до первого ответа '
+            f'{ms(to_first):.0f} мс, p99 первых запросов {p99:.1f} мс'
+        )
+        self.stdout.write(f'  {"путь":<36}{"код":>5}{"первый мс":>11}'
+                          f'{"повтор мс":>11}')
+        for path in paths:
+            self.stdout.write(
+                f'  {path:<36}{runs[-1]["status"][path]:>5}'
+                f'{ms([run["first"][path] for run in runs]):>11.1f}'
+                f'{ms([run["steady"][path] for run in runs]):>11.1f}'
+            )
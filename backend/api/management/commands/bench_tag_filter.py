@@ -0,0 +1,140 @@
+from functools import reduce
+from operator import or_
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from api.filter import TAGS_ALL, TAGS_ANY, RecipeFilter
+from recipes.lists import refresh_lists
+from recipes.models import Recipe, Tag, TagToRecipe
+from users.models import User
+
+BENCH_PREFIX = 'bench_tags'
+
+
+class Rollback(Exception):
+    """Откат тестовых данных после замеров."""
+
+
+def legacy_filter(queryset, slugs, mode):
+    """Прежний фильтр: JOIN с TagToRecipe и DISTINCT, как делал
+    ModelMultipleChoiceFilter по tags__slug."""
+    if mode == TAGS_ALL:
+        for slug in slugs:
+            queryset = queryset.filter(tags__slug=slug)
+    else:
+        queryset = queryset.filter(
+            reduce(or_, (Q(tags__slug=slug) for slug in slugs))
+        )
+    return queryset.distinct()
+
+
+def current_filter(queryset, slugs, mode):
+    return RecipeFilter(
+        {'tags': slugs, 'tags_mode': mode}, queryset=queryset
+    ).qs
+
+
+class Command(BaseCommand):
+    """Фильтр рецептов по многим тегам: прежний JOIN с DISTINCT против
+    RecipeFilter (в PostgreSQL — список тегов в столбце рецепта,
+    в SQLite — полусоединения), в режимах any и all.
+
+    Для каждого варианта — медиана COUNT(*) и первой страницы списка;
+    совпадение найденных рецептов проверяется.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=16)
+        parser.add_argument('--tags-per-recipe', type=int, default=4)
+        parser.add_argument('--selected', type=int, default=12,
+                            help='Сколько тегов выбрано в фильтре.')
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                slugs = self.seed(options)
+                self.bench(slugs, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def bench(self, slugs, options):
+        queryset = Recipe.objects.filter(
+            name__startswith=BENCH_PREFIX
+        ).order_by('name', 'id')
+        limit = options['limit']
+        self.stdout.write(
+            f'рецептов: {options["recipes"]}, тегов выбрано: {len(slugs)}'
+        )
+        for mode in (TAGS_ANY, TAGS_ALL):
+            ids = {}
+            for title, build in (('JOIN + DISTINCT', legacy_filter),
+                                 ('RecipeFilter', current_filter)):
+                filtered = build(queryset, slugs, mode)
+                ids[title] = set(filtered.values_list('id', flat=True))
+                count = self.measure(filtered.count, options['repeat'])
+                page = self.measure(
+                    lambda: list(filtered.values_list('id', flat=True)[
+                        limit:limit * 2
+                    ]),
+                    options['repeat']
+                )
+                self.stdout.write(
+                    f'  {mode:<4}{title:<16}найдено: {len(ids[title]):>7}  '
+                    f'count: {count * 1000:8.2f} мс  '
+                    f'страница: {page * 1000:8.2f} мс'
+                )
+            if len(set(map(frozenset, ids.values()))) > 1:
+                self.stderr.write(f'  {mode}: результаты различаются!')
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            timings.append(perf_counter() - start)
+        return median(timings)
+
+    @staticmethod
+    def seed(options):
+        tags_count = options['tags']
+        Tag.objects.bulk_create(
+            Tag(name=f'{BENCH_PREFIX} {i}', color=f'#BE{i:04X}',
+                slug=f'{BENCH_PREFIX}_{i}')
+            for i in range(tags_count)
+        )
+        tags = list(Tag.objects.filter(
+            slug__startswith=BENCH_PREFIX
+        ).order_by('id'))
+        author = User.objects.create(
+            username=BENCH_PREFIX, email=f'{BENCH_PREFIX}@example.com'
+        )
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'{BENCH_PREFIX} {i}', text='-',
+                    cooking_time=1, image='recipes/image/bench.jpg')
+             for i in range(options['recipes'])),
+            batch_size=1000
+        )
+        recipe_ids = Recipe.objects.filter(
+            name__startswith=BENCH_PREFIX
+        ).values_list('id', flat=True)
+        per_recipe = min(options['tags_per_recipe'], tags_count)
+        TagToRecipe.objects.bulk_create(
+            (TagToRecipe(recipe_id=pk,
+                         tag=tags[(i * 7 + shift) % tags_count])
+             for i, pk in enumerate(recipe_ids)
+             for shift in range(per_recipe)),
+            batch_size=1000
+        )
+        refresh_lists(recipe_ids, batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return [tag.slug for tag in tags[:options['selected']]]
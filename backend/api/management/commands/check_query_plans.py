@@ -0,0 +1,149 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.management.seed import seed
+from recipes.models import (Favorite, IngredientToRecipe, Recipe, ShopList,
+                            Tag, TagToRecipe)
+from users.models import Follow, User
+
+SEED_PREFIX = 'plan_check'
+
+# Таблицы, полный просмотр которых на боевых объёмах недопустим.
+LARGE_TABLES = (
+    Recipe._meta.db_table,
+    TagToRecipe._meta.db_table,
+    IngredientToRecipe._meta.db_table,
+    Favorite._meta.db_table,
+    ShopList._meta.db_table,
+    Follow._meta.db_table,
+    User._meta.db_table,
+)
+
+ENDPOINTS = (
+    ('список рецептов', None, '/api/recipes/'),
+    ('список рецептов', 'user', '/api/recipes/?limit=20&page=3'),
+    ('фильтр по тегам', None, '/api/recipes/?tags={tag}&tags={tag2}'),
+    ('фильтр по всем тегам', None,
+     '/api/recipes/?tags={tag}&tags={tag2}&tags_mode=all'),
+    ('фильтр по ингредиентам', None,
+     '/api/recipes/?ingredients={ingredient}&max_ingredients=5'),
+    ('фильтр по автору', 'user', '/api/recipes/?author={author}'),
+    ('избранное', 'user', '/api/recipes/?is_favorited=1'),
+    ('корзина', 'user', '/api/recipes/?is_in_shopping_cart=1'),
+    ('рецепт', 'user', '/api/recipes/{recipe}/'),
+    ('лента подписок', 'user', '/api/recipes/feed/'),
+    ('список покупок', 'user', '/api/recipes/download_shopping_cart/'),
+)
+
+PG_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SEQ_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+class Rollback(Exception):
+    """Откат тестовых данных после проверки."""
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов основных эндпоинтов.
+
+    Выполняет EXPLAIN для каждого SELECT, который делают эндпоинты
+    рецептов, и завершается ошибкой, если план читает большую таблицу
+    целиком вместо индекса.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='Заполнить базу тестовыми данными '
+                                 'и откатить их после проверки.')
+        parser.add_argument('--recipes', type=int, default=3000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    seed(SEED_PREFIX, options['recipes'])
+                failures = self.check_endpoints(options['verbosity'])
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError(
+                'Полный просмотр таблиц в планах запросов:\n'
+                + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке.'))
+
+    def check_endpoints(self, verbosity):
+        user = User.objects.filter(following__isnull=False).first()
+        recipe = Recipe.objects.order_by('id').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = IngredientToRecipe.objects.values_list(
+            'ingredient_id', flat=True
+        ).first()
+        if (user is None or recipe is None or len(tags) < 2
+                or ingredient is None):
+            raise CommandError('Недостаточно данных, запустите с --seed.')
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = {
+            None: Client(),
+            'user': Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+        }
+        values = {'tag': tags[0], 'tag2': tags[1], 'ingredient': ingredient,
+                  'author': recipe.author_id, 'recipe': recipe.id}
+        self.prepare_planner()
+        failures = []
+        for title, client, url in ENDPOINTS:
+            url = url.format(**values)
+            for sql in self.capture(clients[client], url):
+                plan = self.explain(sql)
+                if verbosity > 1:
+                    self.stdout.write(f'{title} {url}\n{sql}\n{plan}\n')
+                for table in self.seq_scans(plan):
+                    failures.append(f'{title} {url}: {table}\n    {sql}')
+        return failures
+
+    @staticmethod
+    def capture(client, url):
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: статус {response.status_code}')
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].lstrip().upper().startswith('SELECT')]
+
+    @staticmethod
+    def prepare_planner():
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE')
+                # На небольшой базе Seq Scan дешевле индекса, поэтому
+                # запрещаем его: если план всё равно выбирает полный
+                # просмотр, подходящего индекса нет.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    @staticmethod
+    def explain(sql):
+        prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+                  else 'EXPLAIN ')
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    @staticmethod
+    def seq_scans(plan):
+        if connection.vendor == 'postgresql':
+            tables = PG_SEQ_SCAN.findall(plan)
+        else:
+            tables = [match.group(1) for match in (
+                SQLITE_SEQ_SCAN.match(line.strip())
+                for line in plan.splitlines()
+            ) if match]
+        return [table for table in tables if table in LARGE_TABLES]
@@ -0,0 +1,377 @@
+import sys
+import time
+from hashlib import sha256
+from itertools import islice
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty, get_error_detail
+
+from api.serializers import (CreateRecipeSerializer,
+                             IngredientRecipeForCreateSerializer)
+from recipes.cache import bump_recipes_version
+from recipes.lists import list_values
+from recipes.models import (Ingredient, IngredientToRecipe, Recipe, Tag,
+                            TagToRecipe)
+from recipes.ndjson import dumps, loads, open_file
+from users.models import User
+
+IMAGE_PREFIX = Recipe._meta.get_field('image').upload_to
+AMOUNT_DEFAULT = IngredientToRecipe._meta.get_field('amount').default
+
+
+def read_records(stream):
+    """(номер строки, объект или ошибка разбора) по строкам NDJSON.
+
+    Строки выгрузки export_data с type, отличным от recipe, пропускаются.
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError as error:
+            yield number, ValidationError({'line': [str(error)]})
+            continue
+        if not isinstance(record, dict):
+            yield number, ValidationError({'line': ['Ожидался объект.']})
+        elif record.get('type', 'recipe') == 'recipe':
+            yield number, record
+
+
+def author_key(value):
+    """Автор по email или id; из выгрузки — {"id", "email"}."""
+    if isinstance(value, dict):
+        value = value.get('email') or value.get('id')
+    if isinstance(value, str):
+        return 'email', value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return 'id', value
+    return None
+
+
+class Catalog:
+    """Теги, ингредиенты и авторы в памяти: поиск без запросов на строку.
+
+    Теги и ингредиенты загружаются целиком при запуске, авторы —
+    по мере появления в пачках, одним запросом на пачку.
+    """
+
+    def __init__(self):
+        self.tags = {}
+        self.slugs = {}
+        for pk, slug in Tag.objects.values_list('id', 'slug'):
+            self.tags[pk] = self.tags[slug] = pk
+            self.slugs[pk] = slug
+        self.ingredients = {}
+        for pk, name, unit in Ingredient.objects.order_by(
+            '-id'
+        ).values_list('id', 'name', 'measurement_unit'):
+            # При одинаковых названиях остаётся ингредиент с меньшим id.
+            self.ingredients[pk] = self.ingredients[(name, unit)] = pk
+        self.authors = {}
+
+    def load_authors(self, keys):
+        missing = {key for key in keys
+                   if key is not None and key not in self.authors}
+        for kind in ('email', 'id'):
+            values = [value for key, value in missing if key == kind]
+            if not values:
+                continue
+            for pk, email in User.objects.filter(**{
+                f'{kind}__in': values
+            }).values_list('id', 'email'):
+                self.authors['email', email] = self.authors['id', pk] = pk
+        for key in missing:
+            self.authors.setdefault(key, None)
+
+    def tag(self, value):
+        if isinstance(value, dict):
+            value = value.get('slug') or value.get('id')
+        return self.tags.get(value) if isinstance(value, (int, str)) else None
+
+    def ingredient(self, value):
+        if value.get('name') is not None:
+            return self.ingredients.get(
+                (value['name'], value.get('measurement_unit'))
+            )
+        pk = value.get('id')
+        return self.ingredients.get(pk) if isinstance(pk, int) else None
+
+
+class RecipeValidator:
+    """Правила CreateRecipeSerializer без запроса к базе на каждое поле.
+
+    Поля проверяются полями самого сериализатора, теги и ингредиенты —
+    его методами validate_*; id вместо объектов берутся из Catalog.
+    Уникальность текста проверяется одним запросом на пачку.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.serializer = CreateRecipeSerializer()
+        self.amount = IngredientRecipeForCreateSerializer().fields['amount']
+
+    def field(self, name, value, errors):
+        try:
+            return self.serializer.fields[name].run_validation(value)
+        except ValidationError as error:
+            errors[name] = error.detail
+        except DjangoValidationError as error:
+            # Base64ImageField бросает ошибку Django, сериализатор
+            # переводит её так же.
+            errors[name] = get_error_detail(error)
+
+    def validate(self, record, default_author):
+        """Вернуть (данные для создания, ошибки по полям)."""
+        errors = {}
+        data = {name: self.field(name, record.get(name), errors)
+                for name in ('name', 'text', 'cooking_time')}
+        if 'cooking_time' not in errors:
+            try:
+                self.serializer.validate_cooking_time(data['cooking_time'])
+            except ValidationError as error:
+                errors['cooking_time'] = error.detail
+
+        data['image'] = self.image(record.get('image'), errors)
+
+        key = author_key(record.get('author', default_author))
+        data['author_id'] = self.catalog.authors.get(key)
+        if data['author_id'] is None:
+            errors['author'] = ['Автор не найден.']
+
+        tags = record.get('tags')
+        if not isinstance(tags, list):
+            errors['tags'] = ['Ожидался список тегов.']
+        else:
+            data['tags'] = [self.catalog.tag(tag) for tag in tags]
+            if None in data['tags']:
+                errors['tags'] = ['Тег не найден.']
+            else:
+                try:
+                    self.serializer.validate_recipe_tags(data['tags'])
+                except ValidationError as error:
+                    errors['tags'] = error.detail
+
+        data['ingredients'] = self.ingredients(record.get('ingredients'),
+                                               errors)
+        return data, errors
+
+    def image(self, value, errors):
+        """Картинка base64, как в API, или имя файла из выгрузки.
+
+        Файл с таким именем уже должен быть в хранилище: например,
+        каталог media скопирован вместе с выгрузкой.
+        """
+        if isinstance(value, str) and value.startswith(IMAGE_PREFIX):
+            try:
+                if default_storage.exists(value):
+                    return value
+            except SuspiciousFileOperation:
+                pass
+            errors['image'] = ['Файл картинки не найден.']
+            return None
+        return self.field('image', value, errors)
+
+    def ingredients(self, items, errors):
+        if not isinstance(items, list):
+            errors['ingredients'] = ['Ожидался список ингредиентов.']
+            return None
+        result = []
+        for item in items:
+            if not isinstance(item, dict):
+                errors['ingredients'] = ['Ожидался объект ингредиента.']
+                return None
+            pk = self.catalog.ingredient(item)
+            if pk is None:
+                errors['ingredients'] = ['Ингредиент не найден.']
+                return None
+            try:
+                amount = self.amount.run_validation(item.get('amount', empty))
+            except SkipField:
+                # Как в API: без amount берётся значение по умолчанию.
+                amount = AMOUNT_DEFAULT
+            except ValidationError as error:
+                errors['ingredients'] = {'amount': error.detail}
+                return None
+            result.append({'id': pk, 'amount': amount})
+        try:
+            return self.serializer.validate_ingredients(result)
+        except ValidationError as error:
+            errors['ingredients'] = error.detail
+            return None
+
+
+class Command(BaseCommand):
+    """Загрузка рецептов из NDJSON пачками.
+
+    Строка — рецепт в формате API (картинка base64) с автором (email
+    или id, по умолчанию --author); теги — id или slug, ингредиенты —
+    id или название с единицей измерения. Файл export_data тоже
+    подходит: из него берутся строки recipe, картинки — по имени файла.
+
+    Проверки те же, что у CreateRecipeSerializer. Каждая пачка
+    записывается bulk_create в своей транзакции; если база отклонит
+    пачку, её строки записываются по одной, и в отчёт попадают только
+    ошибочные. Сжатие входного файла определяется по расширению.
+    Кэши списков рецептов сбрасываются через общий CACHE_BACKEND.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON или - для stdin.')
+        parser.add_argument('--author',
+                            help='Email автора для строк без автора.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--errors',
+                            help='Записать ошибочные строки в NDJSON-файл.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только проверить.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        self.catalog = Catalog()
+        self.validator = RecipeValidator(self.catalog)
+        self.imported = self.failed = 0
+        # Хеши текстов принятых строк за весь запуск: дубликат может
+        # оказаться в другой пачке, а при --dry-run его нет и в базе.
+        self.seen_texts = set()
+        self.errors = (open_file(options['errors'], 'wb')
+                       if options['errors'] else None)
+        start = time.monotonic()
+        try:
+            if options['input'] == '-':
+                self.load(sys.stdin.buffer, options)
+            else:
+                try:
+                    stream = open_file(options['input'], 'rb')
+                except FileNotFoundError:
+                    raise CommandError(f'Нет файла {options["input"]}.')
+                with stream:
+                    self.load(stream, options)
+        finally:
+            if self.errors is not None:
+                self.errors.close()
+        elapsed = max(time.monotonic() - start, 1e-6)
+        verb = 'проверено' if options['dry_run'] else 'загружено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов {verb}: {self.imported}, с ошибками: {self.failed} '
+            f'за {elapsed:.1f} с ({self.imported / elapsed:.0f} в секунду).'
+        ))
+
+    def load(self, stream, options):
+        records = read_records(stream)
+        while batch := list(islice(records, options['batch_size'])):
+            valid = self.validate(batch, options['author'])
+            if valid and not options['dry_run']:
+                self.save(valid)
+            else:
+                self.imported += len(valid)
+
+    def report(self, number, errors):
+        self.failed += 1
+        if self.errors is not None:
+            self.errors.write(dumps({'line': number, 'errors': errors}))
+        else:
+            self.stderr.write(
+                f'Строка {number}: {dumps(errors).decode().rstrip()}'
+            )
+
+    def validate(self, batch, default_author):
+        """Проверить пачку; вернуть [(номер строки, данные)]."""
+        self.catalog.load_authors(
+            author_key(record.get('author', default_author))
+            for _, record in batch if isinstance(record, dict)
+        )
+        checked = []
+        for number, record in batch:
+            if isinstance(record, ValidationError):
+                self.report(number, record.detail)
+                continue
+            data, errors = self.validator.validate(record, default_author)
+            if errors:
+                self.report(number, errors)
+            else:
+                checked.append((number, data))
+
+        # Правило сериализатора: текст рецепта не повторяется — ни
+        # в базе, ни среди загружаемых строк.
+        texts = {data['text'] for _, data in checked}
+        taken = set(Recipe.objects.filter(text__in=texts).values_list(
+            'text', flat=True
+        ))
+        valid = []
+        for number, data in checked:
+            digest = sha256(data['text'].encode()).digest()
+            if data['text'] in taken or digest in self.seen_texts:
+                self.report(number, {'non_field_errors': [
+                    'Рецепт уже существует'
+                ]})
+            else:
+                self.seen_texts.add(digest)
+                valid.append((number, data))
+        return valid
+
+    def save(self, valid):
+        if len(valid) > 1:
+            try:
+                with transaction.atomic():
+                    self.create([data for _, data in valid])
+                self.imported += len(valid)
+                return
+            except DatabaseError:
+                pass
+        with transaction.atomic():
+            for number, data in valid:
+                try:
+                    with transaction.atomic():
+                        self.create([data])
+                except DatabaseError as error:
+                    self.report(number, {'non_field_errors': [str(error)]})
+                else:
+                    self.imported += 1
+
+    def create(self, rows):
+        # Списки тегов и ингредиентов известны заранее, refresh_lists
+        # не нужен.
+        recipes = []
+        for data in rows:
+            lists = list_values(
+                [(pk, self.catalog.slugs[pk]) for pk in data['tags']],
+                [item['id'] for item in data['ingredients']]
+            )
+            recipes.append(Recipe(
+                author_id=data['author_id'], name=data['name'],
+                text=data['text'], cooking_time=data['cooking_time'],
+                image=data['image'], **lists
+            ))
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            # Без RETURNING (SQLite) bulk_create не вернёт id рецептов.
+            for recipe in recipes:
+                recipe.save()
+        TagToRecipe.objects.bulk_create(
+            TagToRecipe(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, data in zip(recipes, rows)
+            for tag_id in data['tags']
+        )
+        IngredientToRecipe.objects.bulk_create(
+            IngredientToRecipe(recipe_id=recipe.pk,
+                               ingredient_id=item['id'],
+                               amount=item['amount'])
+            for recipe, data in zip(recipes, rows)
+            for item in data['ingredients']
+        )
+        # Внешние ключи PostgreSQL проверяются при коммите, а ошибка
+        # нужна сейчас, внутри точки сохранения пачки или строки.
+        if connection.vendor == 'postgresql':
+            connection.check_constraints()
+        # bulk_create не шлёт сигналы, кэш списков и количества
+        # сбрасываем сами. Веб-процесс увидит сброс только через общий
+        # кэш; с locmem эти кэши выключены (shared_cache_flag).
+        transaction.on_commit(bump_recipes_version)
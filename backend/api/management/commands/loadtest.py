@@ -0,0 +1,306 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from multiprocessing import get_context
+from pathlib import Path
+from statistics import quantiles
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_SCENARIOS = Path(__file__).resolve().parents[1] / 'loadtest.json'
+# Картинка 1x1 для создания рецептов.
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1'
+         'PeAAAADElEQVR4nGM4UaEBAAN0AWnL+tDXAAAAAElFTkSuQmCC')
+PLACEHOLDER = re.compile(r'^\{(\w+)\}$')
+
+
+class Client:
+    """HTTP-клиент нагрузочного теста на urllib, без сторонних пакетов."""
+
+    def __init__(self, base_url, token=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.headers = {'Accept': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Token {token}'
+
+    def request(self, method, path, body=None):
+        """Вернуть (код ответа, тело, время в секундах).
+
+        Ошибка соединения или таймаут дают код 0.
+        """
+        headers = dict(self.headers)
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(self.base_url + path, data=data, headers=headers,
+                          method=method)
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except HTTPError as error:
+            status, content = error.code, error.read()
+        except (URLError, OSError):
+            status, content = 0, b''
+        return status, content, time.perf_counter() - start
+
+    def get_json(self, path):
+        status, content, _ = self.request('GET', path)
+        if status != 200:
+            raise CommandError(f'GET {path}: код {status}.')
+        data = json.loads(content)
+        return data['results'] if isinstance(data, dict) else data
+
+
+def fill(value, variables):
+    """Подставить переменные в строки шаблона шага.
+
+    Строка из одной подстановки заменяется значением как есть, чтобы
+    id в теле запроса оставались числами.
+    """
+    if isinstance(value, str):
+        match = PLACEHOLDER.match(value)
+        if match:
+            return variables[match[1]]
+        return value.format_map(variables)
+    if isinstance(value, list):
+        return [fill(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, variables) for key, item in value.items()}
+    return value
+
+
+def draw(pools):
+    """Случайные значения подстановок для одного прохода сценария."""
+    (tag_id, tag), (_, tag2) = random.sample(pools['tags'], 2)
+    ingredient, ingredient2 = random.sample(pools['ingredients'], 2)
+    return {
+        'recipe': random.choice(pools['recipes']),
+        'author': random.choice(pools['authors']),
+        'tag': tag,
+        'tag2': tag2,
+        'tag_id': tag_id,
+        'ingredient': ingredient,
+        'ingredient2': ingredient2,
+        'page': random.randint(1, pools['pages']),
+        'unique': uuid4().hex[:12],
+        'image': IMAGE,
+    }
+
+
+class Results:
+    """Время ответов и коды по шагам, общие для потоков процесса."""
+
+    def __init__(self):
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, status, ok):
+        with self._lock:
+            step = self.steps.setdefault(
+                name, {'latencies': [], 'errors': 0, 'statuses': Counter()}
+            )
+            step['latencies'].append(latency)
+            step['statuses'][status] += 1
+            if not ok:
+                step['errors'] += 1
+
+    def merge(self, steps):
+        for name, other in steps.items():
+            step = self.steps.setdefault(
+                name, {'latencies': [], 'errors': 0, 'statuses': Counter()}
+            )
+            step['latencies'] += other['latencies']
+            step['errors'] += other['errors']
+            step['statuses'].update(other['statuses'])
+
+
+def run_scenario(client, scenario, variables, results, think):
+    for step in scenario['steps']:
+        method = step.get('method', 'GET')
+        path = fill(step['path'], variables)
+        body = fill(step['body'], variables) if 'body' in step else None
+        status, content, latency = client.request(method, path, body)
+        ok = status in step.get('expect', (200,))
+        results.record(step['name'], latency, status, ok)
+        if not ok:
+            # Следующие шаги могут зависеть от этого.
+            return
+        for variable, key in step.get('save', {}).items():
+            variables[variable] = json.loads(content)[key]
+        if think:
+            time.sleep(random.uniform(0, 2 * think))
+
+
+def run_client(options, scenarios, pools, tokens, deadline, results):
+    anonymous = Client(options['base_url'], timeout=options['timeout'])
+    user = Client(options['base_url'], random.choice(tokens),
+                  options['timeout']) if tokens else None
+    available = [scenario for scenario in scenarios
+                 if user is not None or not scenario.get('auth')]
+    weights = [scenario.get('weight', 1) for scenario in available]
+    while time.monotonic() < deadline:
+        scenario = random.choices(available, weights)[0]
+        client = user if scenario.get('auth') else anonymous
+        run_scenario(client, scenario, draw(pools), results,
+                     options['think'] / 1000)
+
+
+def run_process(args):
+    """Клиенты одного процесса в потоках; вернуть результаты шагов."""
+    options, scenarios, pools, tokens, deadline = args
+    random.seed()
+    results = Results()
+    threads = [
+        threading.Thread(target=run_client, args=(
+            options, scenarios, pools, tokens, deadline, results
+        ))
+        for _ in range(options['clients'])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.steps
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        latency = latencies[0] * 1000 if latencies else 0.0
+        return latency, latency, latency
+    cuts = quantiles(latencies, n=100)
+    return cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+
+
+class Command(BaseCommand):
+    """Нагрузочный тест запущенного бэкенда по сценариям из файла.
+
+    Процессы (--processes) запускают по --clients клиентов в потоках.
+    Клиент в цикле выбирает сценарий по весу и выполняет его шаги:
+    анонимные сценарии без токена, остальные с токеном случайного
+    пользователя из --tokens-file (его создаёт seed_loadtest). Итог —
+    пропускная способность, p50/p95/p99 и доля ошибок по шагам.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS)
+        parser.add_argument('--tokens-file')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--clients', type=int, default=8,
+                            help='Клиентов в каждом процессе.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность в секундах.')
+        parser.add_argument('--think', type=float, default=0,
+                            help='Средняя пауза между шагами, мс.')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output',
+                            help='Записать итоги в JSON-файл.')
+
+    def handle(self, *args, **options):
+        with open(options['scenarios']) as file:
+            scenarios = json.load(file)['scenarios']
+        tokens = []
+        if options['tokens_file']:
+            with open(options['tokens_file']) as file:
+                tokens = [line.strip() for line in file if line.strip()]
+        if not tokens:
+            self.stderr.write('Нет токенов: выполняются только анонимные '
+                              'сценарии.')
+        pools = self.discover(Client(options['base_url'],
+                                     timeout=options['timeout']))
+        client_options = {key: options[key] for key in (
+            'base_url', 'clients', 'think', 'timeout'
+        )}
+
+        start = time.monotonic()
+        deadline = start + options['duration']
+        results = Results()
+        # Клиенты в дочерних процессах не используют Django и базу.
+        with get_context('fork').Pool(options['processes']) as pool:
+            for steps in pool.imap_unordered(run_process, [
+                (client_options, scenarios, pools, tokens, deadline)
+            ] * options['processes']):
+                results.merge(steps)
+        elapsed = time.monotonic() - start
+        report = self.report(results.steps, elapsed)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def discover(self, client):
+        """Id рецептов, авторов, тегов и ингредиентов для подстановок."""
+        recipes = []
+        for page in range(1, 6):
+            found = client.get_json(f'/api/recipes/?page={page}&limit=50')
+            recipes += found
+            if len(found) < 50:
+                break
+        tags = [(tag['id'], tag['slug'])
+                for tag in client.get_json('/api/tags/')]
+        ingredients = [item['id']
+                       for item in client.get_json('/api/ingredients/')]
+        if not recipes or len(tags) < 2 or len(ingredients) < 2:
+            raise CommandError('Мало данных для сценариев, заполните базу: '
+                               'python manage.py seed_loadtest.')
+        return {
+            'recipes': [recipe['id'] for recipe in recipes],
+            'authors': list({recipe['author']['id'] for recipe in recipes}),
+            'tags': tags,
+            'ingredients': ingredients,
+            'pages': max(1, len(recipes) // 6),
+        }
+
+    def report(self, steps, elapsed):
+        rows = []
+        total = {'latencies': [], 'errors': 0, 'statuses': Counter()}
+        for name in sorted(steps):
+            rows.append(self.row(name, steps[name], elapsed))
+            total['latencies'] += steps[name]['latencies']
+            total['errors'] += steps[name]['errors']
+            total['statuses'].update(steps[name]['statuses'])
+        rows.append(self.row('всего', total, elapsed))
+
+        self.stdout.write(
+            f'{"шаг":<22}{"запросов":>9}{"запр/с":>9}{"p50 мс":>9}'
+            f'{"p95 мс":>9}{"p99 мс":>9}{"ошибок":>8}  коды'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["step"]:<22}{row["requests"]:>9}{row["rps"]:>9.1f}'
+                f'{row["p50"]:>9.1f}{row["p95"]:>9.1f}{row["p99"]:>9.1f}'
+                f'{row["error_rate"]:>7.1%}  '
+                + ' '.join(f'{code}×{count}'
+                           for code, count in row['statuses'].items())
+            )
+        if total['statuses'][429]:
+            self.stderr.write(
+                'Ответы 429: сработали ограничения частоты сервера, шаги '
+                'с ними меряют ограничитель. Запустите сервер с пустыми '
+                'THROTTLE_* (см. loadtest.json).'
+            )
+        return {'elapsed': round(elapsed, 2), 'steps': rows}
+
+    @staticmethod
+    def row(name, step, elapsed):
+        requests = len(step['latencies'])
+        p50, p95, p99 = percentiles(step['latencies'])
+        return {
+            'step': name,
+            'requests': requests,
+            'rps': round(requests / elapsed, 2),
+            'p50': round(p50, 2),
+            'p95': round(p95, 2),
+            'p99': round(p99, 2),
+            'error_rate': round(step['errors'] / requests, 4)
+            if requests else 0.0,
+            'statuses': dict(sorted(step['statuses'].items())),
+        }
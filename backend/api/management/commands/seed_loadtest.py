@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from api.management.seed import seed
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Заполнить базу данными для нагрузочного теста loadtest.
+
+    В отличие от замеров bench_* данные сохраняются. Токены созданных
+    пользователей записываются в файл, по одному в строке.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='load')
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--tokens-file', default='loadtest_tokens.txt')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже есть, выберите другой '
+                f'--prefix.'
+            )
+        with transaction.atomic():
+            seed(prefix, options['recipes'])
+            users = list(User.objects.filter(
+                username__startswith=f'{prefix}_'
+            ))
+            # bulk_create не вызывает Token.save, ключи создаются здесь.
+            keys = [Token.generate_key() for _ in users]
+            Token.objects.bulk_create(
+                Token(key=key, user=user) for key, user in zip(keys, users)
+            )
+        with open(options['tokens_file'], 'w') as file:
+            file.writelines(f'{key}\n' for key in keys)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов: {options["recipes"]}, пользователей: '
+            f'{len(keys)}, токены в {options["tokens_file"]}.'
+        ))
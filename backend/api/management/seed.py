@@ -0,0 +1,76 @@
+from hashlib import sha256
+
+from recipes.lists import refresh_lists
+from recipes.models import (Favorite, Ingredient, IngredientToRecipe,
+                            Recipe, ShopList, Tag, TagToRecipe)
+from users.models import Follow, User
+
+
+def seed(prefix, recipes):
+    """Тестовые данные для проверок и замеров.
+
+    Имена объектов начинаются с prefix. Возвращает пользователя
+    с подписками, избранным и корзиной.
+    """
+    # Цвет тега уникален: выборки с разными префиксами не пересекаются.
+    base = sha256(prefix.encode()).hexdigest()[:4].upper()
+    Tag.objects.bulk_create(
+        Tag(name=f'{prefix} {i}', color=f'#{base}{i:02X}',
+            slug=f'{prefix}_{i}')
+        for i in range(8)
+    )
+    tags = list(Tag.objects.filter(slug__startswith=prefix))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'{prefix} {i}', measurement_unit='г')
+        for i in range(200)
+    )
+    ingredients = list(Ingredient.objects.filter(name__startswith=prefix))
+    User.objects.bulk_create(
+        User(username=f'{prefix}_{i}', email=f'{prefix}_{i}@example.com')
+        for i in range(recipes // 10)
+    )
+    users = list(User.objects.filter(username__startswith=prefix))
+    Recipe.objects.bulk_create(
+        (Recipe(author=users[i % len(users)], name=f'{prefix} {i}',
+                text=f'Шаг {i}. Нарезать, смешать, запечь. ' * 10,
+                cooking_time=1 + i % 120,
+                image=f'recipes/image/{prefix}.jpg')
+         for i in range(recipes)),
+        batch_size=1000
+    )
+    recipe_ids = list(Recipe.objects.filter(
+        name__startswith=prefix
+    ).values_list('id', flat=True))
+    TagToRecipe.objects.bulk_create(
+        (TagToRecipe(recipe_id=pk, tag=tags[(i + shift) % len(tags)])
+         for i, pk in enumerate(recipe_ids) for shift in (0, 3)),
+        batch_size=1000
+    )
+    IngredientToRecipe.objects.bulk_create(
+        (IngredientToRecipe(
+            recipe_id=pk,
+            ingredient=ingredients[(i * 7 + shift) % len(ingredients)],
+            amount=1 + shift
+        ) for i, pk in enumerate(recipe_ids) for shift in range(5)),
+        batch_size=1000
+    )
+    refresh_lists(recipe_ids, batch_size=1000)
+    reader = users[0]
+    Follow.objects.bulk_create(
+        Follow(user=reader, author=author) for author in users[1:50]
+    )
+    # Избранное и корзины у многих пользователей, чтобы статистика
+    # планировщика соответствовала реальному распределению.
+    Favorite.objects.bulk_create(
+        (Favorite(user=user, recipe_id=pk)
+         for i, user in enumerate(users)
+         for pk in recipe_ids[i::len(users)][:20]),
+        batch_size=1000
+    )
+    ShopList.objects.bulk_create(
+        (ShopList(user=user, recipe_id=pk)
+         for i, user in enumerate(users)
+         for pk in recipe_ids[i::len(users)][:5]),
+        batch_size=1000
+    )
+    return reader
@@ -1,6 +1,232 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from hashlib import md5
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.metrics import count_cache
+from recipes.cache import get_recipes_version
+from recipes.feed import get_feed_ids
+
+RECIPE_COUNT_KEY = 'recipes:count:{version}:{digest}'
+# Избранное и корзина не меняют версию данных рецептов, поэтому
+# количество с этими фильтрами не кэшируется.
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+def estimated_count(queryset):
+    """Оценка числа строк таблицы по статистике планировщика PostgreSQL.
+
+    None, если база другая или таблицу ещё не анализировали.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class ApproximatePage(Page):
+    """Страница при приблизительном count: соседи по фактическим строкам."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = has_next
+
+    def has_next(self):
+        return self.next_exists
+
+
+class CountPaginator(Paginator):
+    """Paginator, которому count подсказывает пагинация.
+
+    get_count возвращает (количество, приблизительно ли оно). При
+    приблизительном количестве страница не проверяется по num_pages:
+    читается на строку больше, по ней определяется следующая страница,
+    а на последней странице count уточняется. Пустая страница после
+    первой заменяется фактической последней.
+    """
+
+    def __init__(self, object_list, per_page, get_count):
+        super().__init__(object_list, per_page)
+        self.get_count = get_count
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        count, self.approximate = self.get_count(self.object_list)
+        return count
+
+    def page(self, number):
+        count = self.count
+        if not self.approximate:
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            # Оценка больше фактического числа строк: page=last и страницы
+            # за концом данных ведут на фактическую последнюю страницу.
+            number = max(1, ceil(self.object_list.count() / self.per_page))
+            bottom = (number - 1) * self.per_page
+            rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        if not has_next:
+            count = bottom + len(rows)
+        elif count <= bottom + self.per_page:
+            count = bottom + len(rows)
+        self.__dict__['count'] = count
+        return ApproximatePage(rows[:self.per_page], number, self, has_next)
+
+
+class RecipePagination(PageLimitPagination):
+    """Страницы рецептов без COUNT(*) на каждый запрос.
+
+    Количество кэшируется (RECIPES_COUNT_CACHE) по фильтрам запроса
+    и версии данных рецептов, поэтому любое изменение рецептов его
+    сбрасывает. Для списка без фильтров на PostgreSQL, если в таблице
+    больше RECIPES_COUNT_ESTIMATE_THRESHOLD строк, count берётся
+    из статистики планировщика: приблизительно, зато без чтения всей
+    таблицы.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_key = self.get_count_key(request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountPaginator(queryset, page_size, self.get_count)
+
+    def get_count_key(self, request, view):
+        if not settings.RECIPES_COUNT_CACHE:
+            return None
+        filterset_class = getattr(view, 'filterset_class', None)
+        names = filterset_class.base_filters if filterset_class else ()
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key in names
+            for value in values if value != ''
+        )
+        if any(key in USER_FILTERS for key, _ in params):
+            return None
+        digest = md5(repr(params).encode()).hexdigest()
+        return RECIPE_COUNT_KEY.format(
+            version=get_recipes_version(), digest=digest
+        )
+
+    def get_count(self, queryset):
+        if self.count_key is not None:
+            cached = cache.get(self.count_key)
+            if cached is not None:
+                count_cache('recipe_count', 'hit')
+                return cached
+            count_cache('recipe_count', 'miss')
+        result = None
+        threshold = settings.RECIPES_COUNT_ESTIMATE_THRESHOLD
+        if threshold and not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate >= threshold:
+                result = estimate, True
+        if result is None:
+            result = queryset.count(), False
+        if self.count_key is not None:
+            cache.set(self.count_key, result, settings.RECIPES_COUNT_TIMEOUT)
+        return result
+
+
+class FeedPagination(BasePagination):
+    """Keyset-пагинация ленты подписок.
+
+    Курсор хранит (pub_date, id) последнего рецепта страницы, поэтому
+    глубина листания не влияет на стоимость запроса.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ids = get_feed_ids(
+            request.user, self.decode_cursor(request), self.page_size + 1
+        )
+        self.has_next = len(ids) > self.page_size
+        ids = ids[:self.page_size]
+        recipes = queryset.in_bulk(ids)
+        self.page = [recipes[pk] for pk in ids if pk in recipes]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                encoded.encode('ascii')
+            ).decode('ascii').split('|')
+            position = (parse_datetime(pub_date), int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, recipe):
+        raw = f'{recipe.pub_date.isoformat()}|{recipe.pk}'
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
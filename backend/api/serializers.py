@@ -1,15 +1,23 @@
 import djoser.serializers
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 
+from foodgram.metrics import count_cache
+from recipes.cache import fragment_keys
+from recipes.lists import refresh_lists
 from recipes.models import (Favorite, Ingredient, IngredientToRecipe,
                             Recipe, ShopList, Tag, Follow)
 from users.models import User
+from .sparse import SparseFieldsetSerializerMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin,
+                     serializers.ModelSerializer):
     """Сериализатор пользователя."""
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -21,9 +29,12 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка подписки."""
+        if hasattr(obj, 'is_subscribed'):
+            # Аннотация UserQuerySet.with_is_subscribed.
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
-                and obj.following.filter(user=request.user).exists())
+                and obj.followers.filter(user=request.user).exists())
 
 
 class UserCreateSerializer(djoser.serializers.UserCreateSerializer):
@@ -36,7 +47,8 @@ class UserCreateSerializer(djoser.serializers.UserCreateSerializer):
             'last_name', 'password', 'id')
 
 
-class SubscribeListSerializer(djoser.serializers.UserSerializer):
+class SubscribeListSerializer(SparseFieldsetSerializerMixin,
+                              djoser.serializers.UserSerializer):
     """Сериализатор подписок."""
     recipes_count = SerializerMethodField()
     recipes = SerializerMethodField()
@@ -52,6 +64,8 @@ class SubscribeListSerializer(djoser.serializers.UserSerializer):
 
     def get_recipes_count(self, obj):
         """Возвращает количество рецептов автора"""
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
@@ -66,6 +80,8 @@ class SubscribeListSerializer(djoser.serializers.UserSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка подписки пользователей"""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.following.filter(author=obj).exists())
@@ -110,7 +126,75 @@ class IngredientRecipeForCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount',)
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+    """Список рецептов из кэша фрагментов.
+
+    Всё, кроме флагов пользователя, одинаково для всех и кэшируется
+    по id рецепта. Страница собирается одним get_many, поверх
+    фрагментов выставляются is_favorited, is_in_shopping_cart
+    и author.is_subscribed. Фрагменты хранятся целиком, поля,
+    не выбранные через fields и omit, отбрасываются при выдаче.
+    """
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
+
+    def to_representation(self, data):
+        request = self.context.get('request')
+        if (not settings.RECIPES_CACHE or request is None
+                or not request.user.is_authenticated):
+            return super().to_representation(data)
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        keys = fragment_keys([recipe.pk for recipe in recipes])
+        fragments = cache.get_many(keys.values())
+        missing = [pk for pk, key in keys.items() if key not in fragments]
+        count_cache('recipe_fragment', 'hit', len(fragments))
+        count_cache('recipe_fragment', 'miss', len(missing))
+        if missing:
+            fresh = {keys[recipe.pk]: self.fragment(recipe)
+                     for recipe in self.load(missing)}
+            cache.set_many(fresh, settings.RECIPES_FRAGMENT_TIMEOUT)
+            fragments.update(fresh)
+        subscribed = set()
+        if 'author' in self.child.fields:
+            subscribed = set(request.user.following.filter(
+                author__in={recipe.author_id for recipe in recipes}
+            ).values_list('author_id', flat=True))
+        return [
+            self.overlay(fragments[keys[recipe.pk]], recipe, subscribed)
+            for recipe in recipes
+        ]
+
+    @staticmethod
+    def load(recipe_ids):
+        return Recipe.objects.filter(id__in=recipe_ids).select_related(
+            'author'
+        ).prefetch_related('tags', 'ingredient_recipe__ingredient')
+
+    def fragment(self, recipe):
+        # Без request картинка сериализуется относительным URL.
+        data = RecipeReadSerializer(recipe, context={}).data
+        # Флаги пользователя — заглушки на своих местах, чтобы порядок
+        # ключей совпадал с обычной сериализацией.
+        return {field: data.get(field, False)
+                for field in RecipeReadSerializer.Meta.fields}
+
+    def overlay(self, fragment, recipe, subscribed):
+        request = self.context['request']
+        for field in self.user_fields:
+            if hasattr(recipe, field):
+                fragment[field] = getattr(recipe, field)
+            else:
+                fragment.pop(field)
+        fragment['author']['is_subscribed'] = recipe.author_id in subscribed
+        if fragment['image']:
+            fragment['image'] = request.build_absolute_uri(fragment['image'])
+        return {field: fragment[field] for field in self.child.fields
+                if field in fragment}
+
+
+class RecipeReadSerializer(SparseFieldsetSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для просмотра рецепта."""
     tags = TagSerializer(many=True)
     author = UserSerializer()
@@ -127,6 +211,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'tags', 'ingredients',
                   'cooking_time', 'image', 'author',
                   'is_favorited', 'is_in_shopping_cart', 'text',)
+        list_serializer_class = RecipeFragmentListSerializer
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
@@ -202,6 +287,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         ]
         IngredientToRecipe.objects.bulk_create(ingredient_list)
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         tags = validated_data.pop('tags')
@@ -210,9 +296,11 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=request.user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        refresh_lists([recipe.pk])
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -220,8 +308,11 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         IngredientToRecipe.objects.filter(recipe=instance).delete()
         self.create_ingredients(instance, ingredients)
         instance.tags.set(tags)
+        recipe = super().update(instance, validated_data)
+        # save() записал списки экземпляра, поэтому пересчёт — после него.
+        refresh_lists([recipe.pk])
 
-        return super().update(instance, validated_data)
+        return recipe
 
     def to_representation(self, instance):
         request = self.context.get('request')
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+from .authentication import token_deleted, user_changed
+
+
+def connect_signals():
+    # Выход через djoser удаляет токен, деактивация сохраняет пользователя.
+    post_delete.connect(token_deleted, sender=Token)
+    post_save.connect(user_changed, sender=User)
@@ -0,0 +1,69 @@
+from rest_framework.exceptions import ValidationError
+
+# Выборочные поля ответа: ?fields=id,name оставляет перечисленные поля,
+# ?omit=text,ingredients убирает перечисленные. Параметры можно совмещать.
+
+
+def parse_names(request, param):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def sparse_fields(request, available):
+    """Поля из available, выбранные параметрами fields и omit.
+
+    Возвращает None, если параметров нет.
+    """
+    selected = parse_names(request, 'fields')
+    omitted = parse_names(request, 'omit')
+    if selected is None and omitted is None:
+        return None
+    errors = {}
+    for param, names in (('fields', selected), ('omit', omitted)):
+        unknown = sorted((names or set()) - set(available))
+        if unknown:
+            errors[param] = f'Неизвестные поля: {", ".join(unknown)}.'
+    if errors:
+        raise ValidationError(errors)
+    if selected is None:
+        selected = set(available)
+    return tuple(
+        name for name in available
+        if name in selected and name not in (omitted or ())
+    )
+
+
+class SparseFieldsetSerializerMixin:
+    """Сериализатор оставляет только поля из context['fields']."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """Разбор fields и omit для GET-запросов вьюсета.
+
+    Выбранные поля передаются сериализатору через контекст, по ним же
+    вьюсет урезает queryset.
+    """
+
+    def get_sparse_fields(self):
+        if self.request is None or self.request.method != 'GET':
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            serializer_class = self.get_serializer_class()
+            self._sparse_fields = sparse_fields(
+                self.request, serializer_class.Meta.fields
+            )
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
@@ -0,0 +1,167 @@
+import math
+from collections import Counter, OrderedDict
+from threading import Lock
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from foodgram.metrics import THROTTLE_DECISIONS
+
+BUCKET_KEY = 'throttle:{scope}:{ident}'
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Загрузка картинок расходует по токену на каждый начатый мегабайт.
+MEGABYTE = 2 ** 20
+
+_stats = Counter()
+_lock = Lock()
+
+
+def _inc(name):
+    with _lock:
+        _stats[name] += 1
+    THROTTLE_DECISIONS.labels(*reversed(name.split(':', 1))).inc()
+
+
+def throttle_stats():
+    """Пропущенные и отклонённые запросы текущего воркера по областям."""
+    with _lock:
+        stats = dict(_stats)
+    scopes = {}
+    for name, value in stats.items():
+        outcome, scope = name.split(':', 1)
+        scopes.setdefault(scope, {'allowed': 0, 'throttled': 0})
+        scopes[scope][outcome] = value
+    return scopes
+
+
+def parse_rate(rate):
+    """'30/hour' -> (30, 3600), как в SimpleRateThrottle."""
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+def take_tokens(state, capacity, period, cost, now):
+    """Пополнить корзину за прошедшее время и взять cost токенов.
+
+    Отрицательный cost возвращает токены в корзину.
+    """
+    tokens, updated = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    allowed = tokens >= cost
+    if allowed:
+        tokens = min(capacity, tokens - cost)
+    return allowed, (tokens, now)
+
+
+class LocalBucketStore:
+    """Корзины в памяти воркера, не больше THROTTLE_LOCAL_SIZE штук.
+
+    Вытесненная корзина считается полной.
+    """
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key, capacity, period, cost):
+        with self._lock:
+            allowed, state = take_tokens(
+                self._data.pop(key, None), capacity, period, cost, time()
+            )
+            self._data[key] = state
+            while len(self._data) > settings.THROTTLE_LOCAL_SIZE:
+                self._data.popitem(last=False)
+        return allowed, state[0]
+
+
+class SharedBucketStore:
+    """Корзины в кэше Django, общие для воркеров при общем CACHE_BACKEND.
+
+    С locmem работает как локальная замена. get и set не атомарны:
+    при одновременных запросах из разных воркеров корзина может
+    пропустить лишний запрос.
+    """
+
+    def take(self, key, capacity, period, cost):
+        allowed, state = take_tokens(
+            cache.get(key), capacity, period, cost, time()
+        )
+        cache.set(key, state, period)
+        return allowed, state[0]
+
+
+STORES = {'local': LocalBucketStore(), 'shared': SharedBucketStore()}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Корзины токенов для областей из view.throttle_scopes[action].
+
+    Ёмкость корзины и скорость пополнения задаёт DEFAULT_THROTTLE_RATES:
+    '30/hour' — до 30 запросов подряд, затем один раз в две минуты.
+    Состояние корзин сохраняется в request.throttle_state для заголовков.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scopes = getattr(view, 'throttle_scopes', {}).get(view.action, ())
+        store = STORES[settings.THROTTLE_STORE]
+        ident = (request.user.pk if request.user.is_authenticated
+                 else self.get_ident(request))
+        request.throttle_state = []
+        taken = []
+        for scope in scopes:
+            rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+            if not rate:
+                continue
+            capacity, period = parse_rate(rate)
+            cost = min(self.get_cost(request, scope), capacity)
+            key = BUCKET_KEY.format(scope=scope, ident=ident)
+            allowed, tokens = store.take(key, capacity, period, cost)
+            request.throttle_state.append({
+                'scope': scope,
+                'limit': capacity,
+                'remaining': math.floor(tokens),
+                'reset': math.ceil((capacity - tokens) * period / capacity),
+            })
+            if not allowed:
+                # Отклонённый запрос не расходует другие корзины.
+                for _, *bucket, spent in taken:
+                    store.take(*bucket, -spent)
+                _inc(f'throttled:{scope}')
+                self.wait_seconds = (cost - tokens) * period / capacity
+                return False
+            taken.append((scope, key, capacity, period, cost))
+        for scope, *_ in taken:
+            _inc(f'allowed:{scope}')
+        return True
+
+    @staticmethod
+    def get_cost(request, scope):
+        if scope != 'image_upload':
+            return 1
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        return max(1, math.ceil(length / MEGABYTE))
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class RateLimitHeadersMixin:
+    """Заголовки X-RateLimit-* по самой исчерпанной корзине запроса."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        states = getattr(request, 'throttle_state', None)
+        if states:
+            state = min(states,
+                        key=lambda item: item['remaining'] / item['limit'])
+            response['X-RateLimit-Scope'] = state['scope']
+            response['X-RateLimit-Limit'] = state['limit']
+            response['X-RateLimit-Remaining'] = state['remaining']
+            response['X-RateLimit-Reset'] = state['reset']
+        return response
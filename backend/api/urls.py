@@ -1,7 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import UserViewSet, TagViewSet, RecipeViewSet, IngredientViewSet
+from api.views import (AuthCacheStatsView, DbConnectionStatsView,
+                       IngredientViewSet, ProfileDetailView, ProfileListView,
+                       RecipeViewSet, TagViewSet, ThrottleStatsView,
+                       UserViewSet)
 
 app_name = 'api'
 
@@ -12,6 +15,13 @@ router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
+    path('stats/db/', DbConnectionStatsView.as_view(), name='db-stats'),
+    path('stats/auth/', AuthCacheStatsView.as_view(), name='auth-stats'),
+    path('stats/throttle/', ThrottleStatsView.as_view(),
+         name='throttle-stats'),
+    path('stats/profiles/', ProfileListView.as_view(), name='profiles'),
+    path('stats/profiles/<str:profile_id>/', ProfileDetailView.as_view(),
+         name='profile'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
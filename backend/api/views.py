@@ -1,16 +1,29 @@
-from django.db.models import Sum
+import os
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
+from django.templatetags.static import static
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from recipes.models import (Ingredient, Recipe,
                             Tag, ShopList, Favorite)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-
+from foodgram.db_connections import connection_stats
+from foodgram.metrics import timed
+from foodgram.profiling import list_profiles, profile_path
+from recipes.catalog import RETRY_AFTER, read_manifest, schedule_snapshot
 from users.models import Follow, User
+from . import fast
+from .authentication import token_cache_stats
+from .cache import AnonymousListCacheMixin
 from .filter import IngredientFilter, RecipeFilter
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (CreateRecipeSerializer, FavoriteSerializer,
@@ -18,14 +31,40 @@ from .serializers import (CreateRecipeSerializer, FavoriteSerializer,
                           ShopListSerializer, SubscribeListSerializer,
                           TagSerializer, UserSerializer, FollowSerializer,
                           RecipeShortSerializer)
-from .pagination import PageLimitPagination
+from .pagination import (FeedPagination, PageLimitPagination,
+                         RecipePagination)
+from .sparse import SparseFieldsetViewMixin
+from .throttling import (RateLimitHeadersMixin, TokenBucketThrottle,
+                         throttle_stats)
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(RateLimitHeadersMixin, SparseFieldsetViewMixin,
+                  DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = PageLimitPagination
     permission_classes = (AllowAny,)
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scopes = {'subscribe': ('toggle',)}
+
+    def get_serializer_class(self):
+        if self.action == 'subscriptions':
+            return SubscribeListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        return self.prune_queryset(
+            super().get_queryset().with_is_subscribed(self.request.user)
+        )
+
+    def prune_queryset(self, queryset):
+        """Читать из базы только выбранные столбцы пользователя."""
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        columns = [field.name for field in User._meta.concrete_fields
+                   if field.name in fields]
+        return queryset.only('id', *columns)
 
     @action(detail=True, methods=['POST', 'DELETE'])
     def subscribe(self, request, id):
@@ -37,6 +76,7 @@ class UserViewSet(DjoserUserViewSet):
             serializer = FollowSerializer(data=data)
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            author.is_subscribed = True
             subscribe_serializer = SubscribeListSerializer(
                 author,
                 context={'request': request}
@@ -52,11 +92,29 @@ class UserViewSet(DjoserUserViewSet):
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
-        subscriptions_page = self.paginate_queryset(queryset)
-        serializer = SubscribeListSerializer(subscriptions_page,
-                                             many=True,
-                                             context={'request': request})
+        # Подсчёт рецептов группирует строки, и Meta.ordering к такому
+        # запросу не применяется.
+        queryset = User.objects.filter(followers__user=user).order_by(
+            'last_name', 'first_name', 'id'
+        )
+        if settings.API_FAST_READ:
+            page = self.paginate_queryset(
+                queryset.values(*fast.SUBSCRIPTION_COLUMNS)
+            )
+            return self.get_paginated_response(
+                fast.subscriptions(page, request, self.get_sparse_fields())
+            )
+        fields = (self.get_sparse_fields()
+                  or SubscribeListSerializer.Meta.fields)
+        queryset = queryset.with_is_subscribed(user)
+        if 'recipes_count' in fields:
+            queryset = queryset.annotate(recipes_count=Count('recipes'))
+        if 'recipes' in fields:
+            queryset = queryset.prefetch_related('recipes')
+        subscriptions_page = self.paginate_queryset(
+            self.prune_queryset(queryset)
+        )
+        serializer = self.get_serializer(subscriptions_page, many=True)
         return self.get_paginated_response(serializer.data)
 
 
@@ -74,13 +132,57 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ('name',)
 
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_READ:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(fast.ingredients(queryset))
+
+    @action(detail=False)
+    def catalog(self, request):
+        """Версия и адрес снимка каталога для автодополнения.
 
-class RecipeViewSet(viewsets.ModelViewSet):
+        Снимок собирает воркер очереди; пока его нет, ответ 503.
+        """
+        manifest = read_manifest()
+        if manifest is None:
+            schedule_snapshot(delay=0)
+            response = Response(
+                {'detail': 'Каталог ещё не собран, повторите запрос позже.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = RETRY_AFTER
+            return response
+        response = Response({
+            'version': manifest['version'],
+            'url': request.build_absolute_uri(static(manifest['path'])),
+            'count': manifest['count'],
+            'size': manifest['size'],
+        })
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class RecipeViewSet(RateLimitHeadersMixin, SparseFieldsetViewMixin,
+                    AnonymousListCacheMixin, fast.FastRecipeListMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = PageLimitPagination
+    pagination_class = RecipePagination
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scopes = {
+        'create': ('recipe_write', 'image_upload'),
+        'update': ('recipe_write', 'image_upload'),
+        'partial_update': ('recipe_write', 'image_upload'),
+        'destroy': ('recipe_write',),
+        'download_shopping_cart': ('export',),
+        'shopping_cart': ('toggle',),
+        'destroy_shopping_cart': ('toggle',),
+        'favorite': ('toggle',),
+        'destroy_favorite': ('toggle',),
+    }
 
 #    def get_queryset(self):
 #        queryset = Recipe.objects.with_user_annotations(
@@ -98,11 +200,43 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if user.is_authenticated:
             queryset = Recipe.objects.with_user_annotations(
                 self.request.user
-            ).order_by('name')
+            ).order_by('name', 'id')
         else:
-            queryset = Recipe.objects.all().order_by('name')
+            queryset = Recipe.objects.all().order_by('name', 'id')
+        return self.prune_queryset(queryset)
+
+    def prune_queryset(self, queryset):
+        """Загружать только то, что нужно выбранным полям."""
+        if self.request.method != 'GET':
+            return queryset
+        fields = self.get_sparse_fields() or RecipeReadSerializer.Meta.fields
+        if 'text' not in fields:
+            queryset = queryset.defer('text')
+        if (self.action in ('list', 'feed')
+                and self.request.user.is_authenticated):
+            # Связанные данные придут из кэша фрагментов.
+            return queryset
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                'ingredient_recipe__ingredient'
+            )
         return queryset
 
+    @action(detail=False, methods=['GET'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        queryset = self.prune_queryset(
+            Recipe.objects.with_user_annotations(request.user)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['GET'])
     def download_shopping_cart(self, request):
         ingredients = Ingredient.objects.filter(
@@ -114,7 +248,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'ingredienttorecipe__amount'
             )).order_by('name')
 
-        return self.generate_shopping_cart_response(ingredients)
+        with timed('shopping_cart_export'):
+            return self.generate_shopping_cart_response(ingredients)
 
     def generate_shopping_cart_response(self, ingredients):
         shopping_list = ['Список покупок:\n']
@@ -179,3 +314,65 @@ class RecipeViewSet(viewsets.ModelViewSet):
             recipe=get_object_or_404(Recipe, id=pk)
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DbConnectionStatsView(APIView):
+    """Счётчики соединений с базой текущего воркера."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+            'health_checks': settings.DB_CONN_HEALTH_CHECKS,
+            'connections': connection_stats(),
+        })
+
+
+class AuthCacheStatsView(APIView):
+    """Попадания в кэш токенов текущего воркера."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'ttl': settings.TOKEN_CACHE_TTL,
+            'shared': settings.TOKEN_CACHE_SHARED,
+            'tokens': token_cache_stats(),
+        })
+
+
+class ThrottleStatsView(APIView):
+    """Срабатывания ограничителей запросов текущего воркера."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'store': settings.THROTTLE_STORE,
+            'scopes': throttle_stats(),
+        })
+
+
+class ProfileListView(APIView):
+    """Сохранённые профили запросов, новые первыми."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'enabled': settings.PROFILING,
+            'sample_rate': settings.PROFILING_SAMPLE_RATE,
+            'profiles': list_profiles(),
+        })
+
+
+class ProfileDetailView(APIView):
+    """Файл профиля: .prof для pstats, .folded для flame graph."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, profile_id):
+        path = profile_path(profile_id)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True,
+                            filename=path.name)
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from api.async_views import (download_shopping_cart, recipe_detail,
+                             recipe_list)
+from foodgram.urls import urlpatterns as sync_urlpatterns
+
+# Под ASGI эти эндпоинты обслуживаются асинхронными вью,
+# остальные маршруты совпадают с WSGI. Имена нужны для меток метрик.
+urlpatterns = [
+    path('api/recipes/', recipe_list, name='recipes-list'),
+    path('api/recipes/download_shopping_cart/', download_shopping_cart,
+         name='recipes-download-shopping-cart'),
+    path('api/recipes/<int:pk>/', recipe_detail, name='recipes-detail'),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,78 @@
+from collections import Counter
+from threading import Lock, local
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import DB_CONNECTIONS
+
+# Счётчики соединений текущего воркера.
+_stats = Counter()
+_lock = Lock()
+# Соединения, открытые в текущем потоке на время запроса.
+_local = local()
+
+
+def _inc(name):
+    with _lock:
+        _stats[name] += 1
+    DB_CONNECTIONS.labels(name).inc()
+
+
+def _open_aliases():
+    if not hasattr(_local, 'aliases'):
+        _local.aliases = set()
+    return _local.aliases
+
+
+def connection_stats():
+    """Снимок счётчиков: opened, reused, dropped, health_check_failed."""
+    with _lock:
+        return {name: _stats[name] for name in
+                ('opened', 'reused', 'dropped', 'health_check_failed')}
+
+
+def count_opened(sender, connection, **kwargs):
+    _inc('opened')
+    _open_aliases().add(connection.alias)
+
+
+def check_before_reuse(**kwargs):
+    """Проверка соединений, переживших прошлый запрос.
+
+    Выполняется после close_old_connections, поэтому соединения
+    с истёкшим CONN_MAX_AGE к этому моменту уже закрыты.
+    """
+    aliases = _open_aliases()
+    for conn in connections.all():
+        if conn.connection is None:
+            if conn.alias in aliases:
+                aliases.discard(conn.alias)
+                _inc('dropped')
+            continue
+        if settings.DB_CONN_HEALTH_CHECKS and not conn.is_usable():
+            conn.close()
+            aliases.discard(conn.alias)
+            _inc('health_check_failed')
+            _inc('dropped')
+            continue
+        aliases.add(conn.alias)
+        _inc('reused')
+
+
+def count_closed(**kwargs):
+    aliases = _open_aliases()
+    for conn in connections.all():
+        if conn.connection is None and conn.alias in aliases:
+            aliases.discard(conn.alias)
+            _inc('dropped')
+
+
+def connect_signals():
+    connection_created.connect(count_opened)
+    # Подключаемся после close_old_connections из django.db, чтобы видеть
+    # соединения уже после закрытия устаревших.
+    request_started.connect(check_before_reuse)
+    request_finished.connect(count_closed)
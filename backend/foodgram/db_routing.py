@@ -0,0 +1,116 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import LazyObject, empty
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'db-primary-pin:{}'
+
+# Запрос, чтения которого разрешено отправлять на реплики.
+_replica_request = ContextVar('replica_request', default=None)
+
+
+def pin_to_primary(user):
+    """Направлять чтения пользователя на основную базу.
+
+    Держим окно DB_PRIMARY_PIN_SECONDS, пока реплики догоняют запись.
+    Между воркерами окно видно только при общем кэше.
+    """
+    cache.set(PIN_KEY.format(user.pk), True,
+              settings.DB_PRIMARY_PIN_SECONDS)
+
+
+def _is_pinned(request):
+    # Ленивый request.user загружается запросом к базе, который сам
+    # проходит через роутер, поэтому вычислять его здесь нельзя. Пока
+    # он не загружен, читаем с primary: это чтение пользователя сессии,
+    # и хеш пароля в нём должен быть актуальным.
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject):
+        if user._wrapped is empty:
+            return True
+        user = user._wrapped
+    if user is None or not user.is_authenticated:
+        return False
+    pinned = getattr(request, '_primary_pin', None)
+    if pinned is None or pinned[0] != user.pk:
+        pinned = (user.pk, bool(cache.get(PIN_KEY.format(user.pk))))
+        request._primary_pin = pinned
+    return pinned[1]
+
+
+class PrimaryReplicaRouter:
+    """Чтения безопасных запросов — на реплики, остальное — на primary."""
+
+    primary_only = {'authtoken', 'sessions', 'jobs'}
+
+    def db_for_read(self, model, **hints):
+        request = _replica_request.get()
+        if (request is None
+                or not settings.REPLICA_DATABASES
+                or model._meta.app_label in self.primary_only
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block
+                or _is_pinned(request)):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _finish_request(request, response):
+    user = getattr(request, 'user', None)
+    if (request.method not in SAFE_METHODS and response.status_code < 400
+            and user is not None and user.is_authenticated):
+        pin_to_primary(user)
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """Разрешает чтение с реплик для GET/HEAD/OPTIONS.
+
+    После успешного изменяющего запроса пользователь на время
+    закрепляется за основной базой, чтобы флаги избранного и корзины
+    не читались с отстающей реплики.
+    """
+    if not settings.REPLICA_DATABASES:
+        raise MiddlewareNotUsed
+
+    def start(request):
+        safe = request.method in SAFE_METHODS
+        return _replica_request.set(request if safe else None)
+
+    if asyncio.iscoroutinefunction(get_response):
+        finish = sync_to_async(_finish_request)
+
+        async def middleware(request):
+            token = start(request)
+            try:
+                response = await get_response(request)
+            finally:
+                _replica_request.reset(token)
+            await finish(request, response)
+            return response
+    else:
+        def middleware(request):
+            token = start(request)
+            try:
+                response = get_response(request)
+            finally:
+                _replica_request.reset(token)
+            _finish_request(request, response)
+            return response
+    return middleware
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import shutil
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# Метрики в формате Prometheus. Если задан PROMETHEUS_MULTIPROC_DIR,
+# каждый процесс пишет значения в свои файлы в этом каталоге, а /metrics
+# суммирует их по всем воркерам gunicorn. Переменную задаёт и каталог
+# очищает при запуске gunicorn.conf.py; prometheus_client читает её при
+# импорте.
+MULTIPROC_DIR = 'PROMETHEUS_MULTIPROC_DIR'
+if os.environ.get(MULTIPROC_DIR):
+    os.makedirs(os.environ[MULTIPROC_DIR], exist_ok=True)
+
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса.', ['view', 'method']
+)
+REQUESTS = Counter(
+    'foodgram_http_requests', 'Запросы по коду ответа.',
+    ['view', 'method', 'status']
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries', 'Запросы к базе по view.', ['view']
+)
+DB_QUERY_TIME = Counter(
+    'foodgram_db_query_seconds', 'Время запросов к базе по view.', ['view']
+)
+DB_CONNECTIONS = Counter(
+    'foodgram_db_connection_events',
+    'Соединения с базой: opened, reused, dropped, health_check_failed.',
+    ['event']
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests', 'Обращения к кэшам: попадания и промахи.',
+    ['cache', 'result']
+)
+THROTTLE_DECISIONS = Counter(
+    'foodgram_throttle_decisions', 'Решения ограничителей запросов.',
+    ['scope', 'outcome']
+)
+OPERATION_DURATION = Histogram(
+    'foodgram_operation_duration_seconds',
+    'Сохранение картинок и выгрузки.', ['operation']
+)
+JOB_DURATION = Histogram(
+    'foodgram_job_duration_seconds', 'Выполнение фоновых задач.',
+    ['job', 'result']
+)
+
+
+def count_cache(cache, result, amount=1):
+    if amount:
+        CACHE_REQUESTS.labels(cache, result).inc(amount)
+
+
+@contextmanager
+def timed(operation):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_DURATION.labels(operation).observe(perf_counter() - start)
+
+
+def registry():
+    """Реестр для выдачи: сумма по процессам или реестр процесса."""
+    if os.environ.get(MULTIPROC_DIR):
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+
+def clear_multiprocess_dir():
+    """Удалить значения процессов прошлого запуска."""
+    directory = os.environ.get(MULTIPROC_DIR)
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def process_exited(pid):
+    if os.environ.get(MULTIPROC_DIR):
+        multiprocess.mark_process_dead(pid)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class QueryCounter:
+    """Число и время запросов к базе за запрос."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Счётчик текущего запроса. ContextVar копируется в потоки
+# sync_to_async, поэтому под ASGI учитываются и запросы view из пула.
+_query_counter = ContextVar('query_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """execute_wrapper всех соединений: пишет в счётчик запроса."""
+    queries = _query_counter.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.count += 1
+        queries.seconds += perf_counter() - start
+
+
+def install_query_counter(sender=None, connection=None, **kwargs):
+    """Обработчик connection_created: соединения создаются в каждом
+    потоке свои, и обёртка нужна каждому."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def observe(request, response, start, queries):
+    elapsed = perf_counter() - start
+    view = view_name(request)
+    REQUEST_DURATION.labels(view, request.method).observe(elapsed)
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    if queries.count:
+        DB_QUERIES.labels(view).inc(queries.count)
+        DB_QUERY_TIME.labels(view).inc(queries.seconds)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Время, коды ответов и запросы к базе по view."""
+    if not settings.METRICS:
+        raise MiddlewareNotUsed
+    connection_created.connect(install_query_counter)
+    for connection in connections.all():
+        install_query_counter(connection=connection)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            queries = QueryCounter()
+            token = _query_counter.set(queries)
+            start = perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _query_counter.reset(token)
+            observe(request, response, start, queries)
+            return response
+    else:
+        def middleware(request):
+            queries = QueryCounter()
+            token = _query_counter.set(queries)
+            start = perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _query_counter.reset(token)
+            observe(request, response, start, queries)
+            return response
+    return middleware
+
+
+def metrics_view(request):
+    if not settings.METRICS:
+        raise Http404
+    return HttpResponse(generate_latest(registry()),
+                        content_type=CONTENT_TYPE_LATEST)
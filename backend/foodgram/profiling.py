@@ -0,0 +1,262 @@
+import asyncio
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+# Профили хранятся в PROFILING_DIR под своим id: <id>.prof (cProfile,
+# открывается pstats или snakeviz) и <id>.folded (свёрнутые стеки для
+# flamegraph.pl и speedscope).
+PROFILE_FLAG = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+REQUEST_ID = re.compile(r'^[\w-]{1,64}$')
+EXTENSIONS = {'cprofile': '.prof', 'sample': '.folded'}
+
+
+def profiles_root():
+    return Path(settings.PROFILING_DIR)
+
+
+def profile_path(profile_id):
+    """Путь к профилю по id или None, если профиля нет."""
+    if not REQUEST_ID.match(profile_id):
+        return None
+    for extension in EXTENSIONS.values():
+        path = profiles_root() / f'{profile_id}{extension}'
+        if path.exists():
+            return path
+    return None
+
+
+def saved_profiles():
+    """Файлы сохранённых профилей, новые первыми."""
+    root = profiles_root()
+    if not root.is_dir():
+        return []
+    return sorted(
+        (path for path in root.iterdir()
+         if path.suffix in EXTENSIONS.values()),
+        key=lambda path: path.stat().st_mtime, reverse=True
+    )
+
+
+def list_profiles():
+    return [{'id': path.stem, 'format': path.suffix[1:],
+             'size': path.stat().st_size} for path in saved_profiles()]
+
+
+def prune_profiles():
+    """Оставить PROFILING_KEEP последних профилей."""
+    for path in saved_profiles()[settings.PROFILING_KEEP:]:
+        path.unlink(missing_ok=True)
+
+
+def frame_name(code):
+    # Две последние части пути отличают api/views.py от users/views.py.
+    filename = '/'.join(Path(code.co_filename).parts[-2:])
+    return f'{filename}:{code.co_name}'
+
+
+class StackSampler:
+    """Выборочный профилировщик: стек потока запроса раз в interval.
+
+    Накладные расходы не зависят от числа вызовов в коде, поэтому он
+    подходит для фонового профилирования части запросов.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        path.write_text(''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        ))
+
+
+class DeterministicProfiler:
+    """cProfile: точное число вызовов и время каждой функции."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+def is_staff(request):
+    """Сотрудник по сессии или по заголовку Authorization."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    drf_request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(drf_request)
+        except APIException:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
+
+
+def profile_flag(request):
+    flag = (request.GET.get(PROFILE_FLAG)
+            or request.META.get(PROFILE_HEADER))
+    if not flag or flag in ('0', 'false'):
+        return None
+    return flag
+
+
+def requested_mode(request):
+    """Режим, запрошенный сотрудником, или None."""
+    flag = profile_flag(request)
+    if flag is None or not is_staff(request):
+        return None
+    return 'sample' if flag == 'sample' else 'cprofile'
+
+
+def choose_mode(requested):
+    if requested is None and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sample'
+    return requested
+
+
+def make_profiler(mode):
+    if mode == 'cprofile':
+        return DeterministicProfiler()
+    return StackSampler(settings.PROFILING_INTERVAL / 1000)
+
+
+def new_profile_id(request):
+    """Id профиля: id запроса клиента и случайный суффикс сервера.
+
+    Суффикс не даёт клиенту выбрать id и перезаписать чужой профиль.
+    """
+    suffix = uuid4().hex[:12]
+    request_id = request.META.get(REQUEST_ID_HEADER, '')
+    if REQUEST_ID.match(request_id):
+        return f'{request_id[:48]}-{suffix}'
+    return suffix
+
+
+def save_profile(profiler, mode, request):
+    """Записать профиль и вернуть его id или None, если id занят."""
+    root = profiles_root()
+    root.mkdir(parents=True, exist_ok=True)
+    profile_id = new_profile_id(request)
+    path = root / f'{profile_id}{EXTENSIONS[mode]}'
+    tmp = path.with_name(f'.{path.name}.tmp')
+    profiler.dump(tmp)
+    try:
+        # В отличие от os.replace, link не перезаписывает существующий файл.
+        os.link(tmp, path)
+    except FileExistsError:
+        return None
+    finally:
+        tmp.unlink(missing_ok=True)
+    prune_profiles()
+    return profile_id
+
+
+# Под ASGI профилируется поток event loop, где идут и другие запросы,
+# поэтому одновременно профилируется не больше одного запроса.
+_loop_profiling = threading.Lock()
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """Профилирование запросов по требованию и выборочно.
+
+    Запрос сотрудника с ?_profile=1 или заголовком X-Profile: 1
+    выполняется под cProfile, ?_profile=sample — под выборочным
+    профилировщиком. Кроме того, доля PROFILING_SAMPLE_RATE всех
+    запросов профилируется выборочно в фоне. Профиль сохраняется
+    в PROFILING_DIR, его id возвращается в заголовке X-Profile-Id;
+    скачать профиль можно по /api/stats/profiles/<id>/.
+
+    При PROFILING=False middleware отключается при запуске и не
+    добавляет накладных расходов. Профилируется только поток запроса:
+    под ASGI это event loop, и код view, вынесенный в пул потоков,
+    в профиль не попадает, как и генерация потоковых ответов.
+    """
+    if not settings.PROFILING:
+        raise MiddlewareNotUsed
+
+    def finish(response, requested, profile_id):
+        # Фоновые профили клиенту не показываются.
+        if requested and profile_id is not None:
+            response['X-Profile-Id'] = profile_id
+        return response
+
+    if asyncio.iscoroutinefunction(get_response):
+        staff_mode = sync_to_async(requested_mode)
+        save = sync_to_async(save_profile, thread_sensitive=False)
+
+        async def middleware(request):
+            requested = None
+            if profile_flag(request) is not None:
+                requested = await staff_mode(request)
+            mode = choose_mode(requested)
+            if mode is None or not _loop_profiling.acquire(blocking=False):
+                return await get_response(request)
+            try:
+                with make_profiler(mode) as profiler:
+                    response = await get_response(request)
+            finally:
+                _loop_profiling.release()
+            profile_id = await save(profiler, mode, request)
+            return finish(response, requested, profile_id)
+    else:
+        def middleware(request):
+            requested = requested_mode(request)
+            mode = choose_mode(requested)
+            if mode is None:
+                return get_response(request)
+            with make_profiler(mode) as profiler:
+                response = get_response(request)
+            profile_id = save_profile(profiler, mode, request)
+            return finish(response, requested, profile_id)
+    return middleware
@@ -1,6 +1,8 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,17 +32,22 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 
 MIDDLEWARE = [
+    'foodgram.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram.profiling.profiling_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.db_routing.replica_routing_middleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -74,10 +81,168 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', '5432')
+        'PORT': os.getenv('DB_PORT', '5432'),
+        # Постоянные соединения: сколько секунд держать соединение
+        # между запросами (0 — закрывать после каждого запроса).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Режим совместимости с pgbouncer в transaction pooling.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_PGBOUNCER') == 'True',
     }
 }
 
+# Проверять постоянное соединение перед повторным использованием.
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
+# Необязательная реплика для чтения. Для локальной проверки подойдёт
+# копия базы SQLite: DB_REPLICA_NAME=/path/to/replica.sqlite3
+REPLICA_DATABASES = []
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append('replica')
+
+DATABASE_ROUTERS = ['foodgram.db_routing.PrimaryReplicaRouter']
+
+# Сколько секунд после записи читать данные пользователя с primary.
+DB_PRIMARY_PIN_SECONDS = int(os.getenv('DB_PRIMARY_PIN_SECONDS', 10))
+
+# Cache
+# locmem — LRU внутри процесса, file — общий для процессов с доступом
+# к CACHE_LOCATION, redis — общий для всех хостов.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_OPTIONS = {
+    'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+}
+if CACHE_BACKEND == 'redis':
+    if not find_spec('django_redis'):
+        raise ImproperlyConfigured('CACHE_BACKEND=redis требует django-redis.')
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'redis://redis:6379/0'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache'),
+            'OPTIONS': CACHE_OPTIONS,
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': CACHE_OPTIONS,
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'Неизвестный CACHE_BACKEND: {CACHE_BACKEND}.')
+# Изменения из других процессов (worker, команды manage.py) видны
+# веб-процессу только через общий кэш.
+CACHE_SHARED = CACHE_BACKEND != 'locmem'
+
+
+def shared_cache_flag(name, default=CACHE_SHARED):
+    """Флаг кэша, который сбрасывают и другие процессы.
+
+    По умолчанию включён только с общим кэшем; включить его с locmem
+    нельзя: кэш веб-процесса не увидит изменений из других процессов.
+    """
+    enabled = os.getenv(name, str(default)) == 'True'
+    if enabled and not CACHE_SHARED:
+        raise ImproperlyConfigured(f'{name} требует общего CACHE_BACKEND.')
+    return enabled
+
+
+# Кэш списков рецептов для анонимов и фрагментов рецептов.
+RECIPES_CACHE = shared_cache_flag('RECIPES_CACHE')
+
+# Время жизни закэшированных списков рецептов для анонимов, секунды.
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', 300))
+# Время жизни фрагментов рецептов, общих для всех пользователей.
+RECIPES_FRAGMENT_TIMEOUT = int(os.getenv('RECIPES_FRAGMENT_TIMEOUT', 3600))
+
+# Быстрое чтение списков рецептов, ингредиентов и подписок через values().
+API_FAST_READ = os.getenv('API_FAST_READ') == 'True'
+
+# Сжатие JSON и текстовых ответов: brotli (если установлен) или gzip.
+# Ответы короче COMPRESSION_MIN_SIZE байт не сжимаются.
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'True') == 'True'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_LEVEL = int(os.getenv('BROTLI_LEVEL', 5))
+
+# Кэш токенов авторизации: общий кэш (TOKEN_CACHE_SHARED, нужен общий
+# CACHE_BACKEND, например redis) и LRU воркера на TOKEN_CACHE_SIZE записей
+# с временем жизни TOKEN_CACHE_TTL секунд. Записи LRU сверяются с отметкой
+# отзыва в общем кэше; без общего кэша токены читаются из базы.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_SHARED = shared_cache_flag('TOKEN_CACHE_SHARED', default=False)
+TOKEN_CACHE_SHARED_TTL = int(os.getenv('TOKEN_CACHE_SHARED_TTL', 300))
+
+# Очередь фоновых задач (python manage.py run_workers).
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_MODE = os.getenv('JOBS_MODE', 'process')
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+# Пауза перед повтором: JOBS_BACKOFF_BASE * 2^(попытка - 1), не больше
+# JOBS_BACKOFF_MAX секунд.
+JOBS_BACKOFF_BASE = float(os.getenv('JOBS_BACKOFF_BASE', 5))
+JOBS_BACKOFF_MAX = float(os.getenv('JOBS_BACKOFF_MAX', 3600))
+# Задача, которую воркер держит дольше, возвращается в очередь.
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', 600))
+
+# Задержка пересборки снимка каталога ингредиентов после изменений:
+# правки за это время попадают в одну сборку.
+INGREDIENT_CATALOG_DELAY = int(os.getenv('INGREDIENT_CATALOG_DELAY', 5))
+
+# Профилирование запросов: сотрудники добавляют ?_profile=1 (cProfile)
+# или ?_profile=sample (выборочно), доля PROFILING_SAMPLE_RATE остальных
+# запросов профилируется выборочно в фоне. Выключено по умолчанию.
+PROFILING = os.getenv('PROFILING') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+# Период выборки стека, мс.
+PROFILING_INTERVAL = float(os.getenv('PROFILING_INTERVAL', 5))
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_KEEP = int(os.getenv('PROFILING_KEEP', 200))
+
+# Метрики Prometheus на /metrics. Под gunicorn задайте
+# PROMETHEUS_MULTIPROC_DIR, чтобы суммировать значения всех воркеров.
+METRICS = os.getenv('METRICS', 'True') == 'True'
+# Порт, на котором run_workers отдаёт метрики фоновых задач; 0 — не отдавать.
+JOBS_METRICS_PORT = int(os.getenv('JOBS_METRICS_PORT', 0))
+
+# Прогрев воркера gunicorn до первого запроса (gunicorn.conf.py):
+# соединения с базами и GET-запросы WARMUP_PATHS к самому приложению
+# с заголовком Host: WARMUP_HOST (по умолчанию первый из ALLOWED_HOSTS).
+WARMUP = os.getenv('WARMUP', 'True') == 'True'
+WARMUP_HOST = os.getenv('WARMUP_HOST', '')
+WARMUP_PATHS = os.getenv(
+    'WARMUP_PATHS',
+    '/api/tags/, /api/ingredients/?name=а, /api/ingredients/catalog/, '
+    '/api/recipes/?page=1&limit=6, /api/recipes/feed/'
+).split(', ')
+
+# Количество рецептов в ответе списка кэшируется по фильтрам и версии
+# данных рецептов (только с общим кэшем). Список без фильтров
+# на PostgreSQL, если в таблице не меньше RECIPES_COUNT_ESTIMATE_THRESHOLD
+# строк, получает count из статистики планировщика (приблизительно);
+# 0 — всегда точный.
+RECIPES_COUNT_CACHE = shared_cache_flag('RECIPES_COUNT_CACHE')
+RECIPES_COUNT_TIMEOUT = int(os.getenv('RECIPES_COUNT_TIMEOUT', 600))
+RECIPES_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('RECIPES_COUNT_ESTIMATE_THRESHOLD', 100000)
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -116,6 +281,14 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Загрузки называются по SHA-256 содержимого: одинаковые картинки хранятся
+# одним файлом, а nginx кэширует их навсегда.
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentHashStorage'
+# Файлы моложе MEDIA_GC_GRACE секунд не удаляются ни при освобождении,
+# ни командой gc_media: ссылка на них может быть ещё не закоммичена.
+MEDIA_GC_GRACE = int(os.getenv('MEDIA_GC_GRACE', 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -131,10 +304,36 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
+
+    # orjson, если установлен; иначе стандартный модуль json.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+
+    # Корзины токенов api.throttling.TokenBucketThrottle: ёмкость
+    # и скорость пополнения. image_upload считается в мегабайтах.
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_write': os.getenv('THROTTLE_RECIPE_WRITE', '30/hour'),
+        'image_upload': os.getenv('THROTTLE_IMAGE_UPLOAD', '200/hour'),
+        'export': os.getenv('THROTTLE_EXPORT', '10/min'),
+        'toggle': os.getenv('THROTTLE_TOGGLE', '120/min'),
+    },
 }
 
+# local — корзины в памяти воркера, shared — в кэше Django (общие для
+# воркеров при CACHE_BACKEND=redis или file).
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'local')
+THROTTLE_LOCAL_SIZE = int(os.getenv('THROTTLE_LOCAL_SIZE', 10000))
+
 DJOSER = {
     'HIDE_USERS': False,
     'USERNAME_FIELD': 'email',
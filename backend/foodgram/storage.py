@@ -0,0 +1,60 @@
+import os
+from hashlib import sha256
+from uuid import uuid4
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .metrics import timed
+
+# Временные файлы загрузки до переименования; gc_media удаляет
+# оставшиеся после сбоя.
+UPLOAD_PREFIX = '.upload-'
+
+
+def content_name(name, content):
+    """'recipes/image/x.JPG' -> 'recipes/image/<sha256>.jpg'."""
+    digest = sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, digest.hexdigest() + extension)
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Файлы называются по SHA-256 содержимого.
+
+    Одинаковые загрузки получают одно имя и один файл на диске. Файл
+    под хешированным именем никогда не меняется, поэтому nginx отдаёт
+    его с вечным кэшем. Удаляет файлы recipes.media.release_file, когда
+    на них не остаётся ссылок, и команда gc_media.
+    """
+
+    def save(self, name, content, max_length=None):
+        with timed('image_store'):
+            return self._save_by_hash(name, content, max_length)
+
+    def _save_by_hash(self, name, content, max_length):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content).replace('\\', '/')
+        if self.exists(name):
+            # Свежее время изменения защищает файл от удаления, пока
+            # новая ссылка на него ещё не закоммичена.
+            os.utime(self.path(name))
+            return name
+        tmp = super().save(
+            os.path.join(os.path.dirname(name),
+                         f'{UPLOAD_PREFIX}{uuid4().hex}'),
+            content, max_length
+        )
+        # Одновременная загрузка того же файла перезапишет его тем же
+        # содержимым.
+        os.replace(self.path(tmp), self.path(name))
+        return name
@@ -0,0 +1,25 @@
+from django.test import TransactionTestCase, override_settings
+
+from users.models import User
+
+
+# Реплика указывает на ту же базу: роутер и middleware работают как
+# с настоящей, а тестовая база одна. Без транзакции TestCase: внутри
+# транзакции роутер всегда выбирает primary.
+@override_settings(REPLICA_DATABASES=['default'])
+class ReplicaRoutingTests(TransactionTestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', password='admin-password',
+            username='admin', first_name='Admin', last_name='Admin'
+        )
+
+    def test_admin_login_with_replica(self):
+        response = self.client.post('/admin/login/', {
+            'username': 'admin@example.com', 'password': 'admin-password',
+            'next': '/admin/',
+        })
+        self.assertRedirects(response, '/admin/')
+        response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
@@ -3,12 +3,21 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.metrics import metrics_view
+from recipes.catalog import CATALOG_DIR, catalog_root
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('api.urls', namespace='api'))
+    path('api/', include('api.urls', namespace='api')),
+    # nginx этот путь не проксирует, метрики собираются внутри сети.
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+    # Снимок каталога ингредиентов, в бою его отдаёт nginx.
+    urlpatterns += static(
+        settings.STATIC_URL + CATALOG_DIR, document_root=catalog_root()
+    )
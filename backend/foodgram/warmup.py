@@ -0,0 +1,106 @@
+import logging
+import sys
+from io import BytesIO
+from time import perf_counter
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def load_code():
+    """Импортировать URLconf, а с ним view, сериализаторы и DRF.
+
+    Без этого импорт происходит на первом запросе воркера. Базу не
+    трогает, поэтому годится и для мастера gunicorn до fork.
+    """
+    get_resolver().url_patterns
+
+
+def warm_host():
+    if settings.WARMUP_HOST:
+        return settings.WARMUP_HOST
+    for host in settings.ALLOWED_HOSTS:
+        host = host.strip()
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def call(application, path, host=None, headers=None):
+    """GET-запрос к WSGI-приложению в обход сети; вернуть код ответа.
+
+    headers — дополнительные ключи environ, например HTTP_AUTHORIZATION.
+    """
+    path, _, query = path.partition('?')
+    environ = {
+        **(headers or {}),
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': quote(query, safe='=&%+'),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host or warm_host(),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    status = []
+    response = application(environ, lambda code, headers, *_: status.append(
+        code
+    ))
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return int(status[0].split()[0])
+
+
+def warm_up(application=None):
+    """Прогреть воркер до первого запроса; вернуть время этапов, с.
+
+    Импортирует код, открывает соединения со всеми базами и выполняет
+    запросы из WARMUP_PATHS: они заполняют кэши версий, анонимный кэш
+    первой страницы рецептов, снимок каталога ингредиентов и ленивые
+    структуры Django и DRF. Ошибки прогрева не мешают запуску.
+    """
+    timings = {}
+    start = perf_counter()
+    load_code()
+    timings['code'] = perf_counter() - start
+
+    start = perf_counter()
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except Exception:
+            logger.exception('Прогрев: нет соединения с %s.',
+                             connection.alias)
+    timings['connections'] = perf_counter() - start
+
+    if application is None:
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+    start = perf_counter()
+    for path in settings.WARMUP_PATHS:
+        try:
+            status = call(application, path)
+        except Exception:
+            logger.exception('Прогрев: ошибка запроса %s.', path)
+        else:
+            if status >= 500:
+                logger.warning('Прогрев: %s ответил %s.', path, status)
+    timings['requests'] = perf_counter() - start
+    return timings
@@ -0,0 +1,36 @@
+# Настройки gunicorn: файл читается автоматически из рабочего каталога.
+import os
+
+# Воркеры пишут метрики в общий каталог, /metrics суммирует их. Задаётся
+# до импорта prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+from foodgram.metrics import clear_multiprocess_dir, process_exited  # noqa
+from foodgram.warmup import load_code, warm_up  # noqa
+
+# Приложение и URLconf импортируются один раз в мастере, воркеры
+# получают их готовыми при fork. Соединения с базой мастер не открывает.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def on_starting(server):
+    # Значения метрик прошлого запуска не должны попасть в /metrics.
+    clear_multiprocess_dir()
+    if server.cfg.preload_app:
+        load_code()
+
+
+def post_worker_init(worker):
+    # Воркер начинает принимать запросы только после прогрева.
+    from django.conf import settings
+
+    if settings.WARMUP:
+        timings = warm_up(worker.wsgi)
+        worker.log.info('Прогрев: %s', ', '.join(
+            f'{stage} {seconds * 1000:.0f} мс'
+            for stage, seconds in timings.items()
+        ))
+
+
+def child_exit(server, worker):
+    process_exited(worker.pid)
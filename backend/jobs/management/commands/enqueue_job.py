@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    """Поставить задачу в очередь из командной строки."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('name')
+        parser.add_argument('--payload', default='{}',
+                            help='Аргументы задачи в JSON.')
+        parser.add_argument('--dedup-key')
+        parser.add_argument('--delay', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            payload = json.loads(options['payload'])
+            job = enqueue(options['name'], payload,
+                          dedup_key=options['dedup_key'],
+                          delay=options['delay'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(str(job))
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from prometheus_client import start_http_server
+
+from foodgram.metrics import (clear_multiprocess_dir, process_exited,
+                              registry)
+from jobs.worker import work, work_in_process
+
+
+class Command(BaseCommand):
+    """Запуск воркеров очереди фоновых задач.
+
+    Воркеры работают в отдельных процессах (--mode process) или потоках
+    (--mode thread) и берут задачи из таблицы jobs_job, брокер не нужен.
+    С --burst команда завершается, когда готовых задач не осталось.
+    С --metrics-port длительность задач отдаётся в формате Prometheus;
+    для процессов нужен PROMETHEUS_MULTIPROC_DIR.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.JOBS_WORKERS)
+        parser.add_argument('--mode', choices=('process', 'thread'),
+                            default=settings.JOBS_MODE)
+        parser.add_argument('--burst', action='store_true')
+        parser.add_argument('--metrics-port', type=int,
+                            default=settings.JOBS_METRICS_PORT,
+                            help='Отдавать метрики Prometheus на этом порту.')
+
+    def handle(self, *args, **options):
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        if options['metrics_port']:
+            clear_multiprocess_dir()
+        if options['mode'] == 'process':
+            # Соединения с базой не должны достаться дочерним процессам.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            workers = [
+                context.Process(target=work_in_process,
+                                args=(f'{prefix}:{number}', stop,
+                                      options['burst']))
+                for number in range(options['workers'])
+            ]
+        else:
+            stop = threading.Event()
+            workers = [
+                threading.Thread(target=work,
+                                 args=(f'{prefix}:{number}', stop,
+                                       options['burst']))
+                for number in range(options['workers'])
+            ]
+
+        def shutdown(signum, frame):
+            self.stdout.write('Остановка воркеров...')
+            stop.set()
+
+        self.stdout.write(
+            f'Воркеров: {options["workers"]} ({options["mode"]})'
+        )
+        for worker in workers:
+            worker.start()
+        if options['metrics_port']:
+            # Сервер метрик — поток в родительском процессе, после fork.
+            start_http_server(options['metrics_port'], registry=registry())
+        # Обработчики ставим после fork, чтобы их не унаследовали процессы.
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+        for worker in workers:
+            worker.join()
+            if options['mode'] == 'process':
+                process_exited(worker.pid)
@@ -0,0 +1,161 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from foodgram.metrics import JOB_DURATION
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: имя -> функция.
+registry = {}
+
+
+def task(name=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи передаются именованными и должны сериализоваться
+    в JSON.
+    """
+    def decorator(func):
+        registry[name or f'{func.__module__}.{func.__name__}'] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, dedup_key=None, delay=0,
+            max_attempts=None):
+    """Поставить задачу в очередь.
+
+    Если задача с тем же dedup_key ещё ждёт в очереди, новая
+    не создаётся и возвращается существующая. Внутри транзакции запроса
+    ставьте задачу через transaction.on_commit.
+    """
+    if name not in registry:
+        raise ValueError(f'Неизвестная задача: {name}')
+    if dedup_key is not None:
+        existing = Job.objects.filter(
+            dedup_key=dedup_key, status=Job.QUEUED
+        ).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                name=name,
+                payload=payload or {},
+                dedup_key=dedup_key,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            )
+    except IntegrityError:
+        if dedup_key is None:
+            raise
+        return Job.objects.get(dedup_key=dedup_key, status=Job.QUEUED)
+
+
+def claim(worker):
+    """Взять в работу одну готовую задачу или вернуть None."""
+    now = timezone.now()
+    ready = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = ready.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status = Job.RUNNING
+            job.locked_by = worker
+            job.locked_at = now
+            job.attempts += 1
+            job.save(update_fields=['status', 'locked_by', 'locked_at',
+                                    'attempts'])
+            return job
+    # SQLite без SKIP LOCKED: записи в базу идут по одной, поэтому
+    # условный UPDATE забирает задачу только у одного воркера.
+    for pk in ready.values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    """Пауза перед повтором: экспонента с разбросом ±20%."""
+    delay = min(settings.JOBS_BACKOFF_MAX,
+                settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def retry_or_fail(jobs, error, run_at):
+    """Вернуть задачи в очередь; если там уже есть дубликат — завершить."""
+    try:
+        with transaction.atomic():
+            return jobs.update(status=Job.QUEUED, last_error=error,
+                               locked_by='', run_at=run_at)
+    except IntegrityError:
+        return jobs.update(
+            status=Job.FAILED, finished_at=timezone.now(), locked_by='',
+            last_error=f'{error}\nВ очереди уже есть задача с тем же ключом.'
+        )
+
+
+def run(job):
+    """Выполнить задачу и записать результат. True, если успешно."""
+    func = registry.get(job.name)
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by,
+                               status=Job.RUNNING)
+    start = perf_counter()
+    try:
+        if func is None:
+            raise LookupError(f'Неизвестная задача: {job.name}')
+        func(**job.payload)
+    except Exception:
+        JOB_DURATION.labels(job.name, 'failed').observe(
+            perf_counter() - start
+        )
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            owned.update(status=Job.FAILED, finished_at=now,
+                         last_error=error, locked_by='')
+            logger.error('Задача %s не выполнена:\n%s', job, error)
+        else:
+            retry_or_fail(owned, error,
+                          now + timedelta(seconds=backoff(job.attempts)))
+            logger.warning('Задача %s будет повторена:\n%s', job, error)
+        return False
+    JOB_DURATION.labels(job.name, 'done').observe(perf_counter() - start)
+    owned.update(status=Job.DONE, finished_at=timezone.now(), locked_by='')
+    return True
+
+
+def requeue_stale():
+    """Вернуть в очередь задачи воркеров, переставших отвечать."""
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOBS_LOCK_TIMEOUT
+        )
+    )
+    error = 'Воркер не завершил задачу за JOBS_LOCK_TIMEOUT.'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=timezone.now(), last_error=error,
+        locked_by=''
+    )
+    requeued = 0
+    for pk in stale.values_list('pk', flat=True):
+        requeued += retry_or_fail(stale.filter(pk=pk), error, timezone.now())
+    return requeued + failed
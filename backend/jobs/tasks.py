@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+
+
+@task('jobs.purge_finished')
+def purge_finished(days=7):
+    """Удалить выполненные задачи старше days дней."""
+    Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
@@ -0,0 +1,42 @@
+import logging
+import signal
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .queue import claim, requeue_stale, run
+
+logger = logging.getLogger(__name__)
+
+
+def work(worker, stop, burst=False):
+    """Цикл воркера: брать задачи, пока не установлен stop.
+
+    В режиме burst воркер завершается, когда готовых задач не осталось.
+    """
+    done = failed = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim(worker)
+            if job is None:
+                if burst:
+                    break
+                requeue_stale()
+                stop.wait(settings.JOBS_POLL_INTERVAL)
+                continue
+            if run(job):
+                done += 1
+            else:
+                failed += 1
+    finally:
+        connections.close_all()
+    logger.info('Воркер %s: выполнено %s, с ошибкой %s',
+                worker, done, failed)
+    return done, failed
+
+
+def work_in_process(worker, stop, burst):
+    # Ctrl+C получает вся группа процессов, останавливаемся по stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(worker, stop, burst)
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib import admin
 
+from .lists import refresh_lists
 from .models import (Favorite, Ingredient, IngredientToRecipe, Recipe,
                      ShopList, Tag)
 
@@ -22,6 +23,10 @@ class RecipeAdmin(admin.ModelAdmin):
     def favorites_amount(self, obj):
         return obj.favorites.count()
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_lists([form.instance.pk])
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -0,0 +1,94 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+RECIPES_VERSION_KEY = 'recipes:version'
+CATALOG_VERSION_KEY = 'recipes:catalog-version'
+FRAGMENT_KEY = 'recipes:fragment:{version}:{pk}'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Версию могли вытеснить из кэша: начинаем с отметки времени,
+        # чтобы не совпасть со старыми ключами.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def get_recipes_version():
+    """Текущая версия данных рецептов для ключей кэша."""
+    return get_version(RECIPES_VERSION_KEY)
+
+
+def bump_recipes_version():
+    bump_version(RECIPES_VERSION_KEY)
+
+
+def fragment_keys(recipe_ids):
+    """Ключи кэша общей для всех пользователей части рецептов.
+
+    Версия каталога меняется при правке тегов и ингредиентов, которые
+    входят во фрагменты многих рецептов сразу.
+    """
+    version = get_version(CATALOG_VERSION_KEY)
+    return {pk: FRAGMENT_KEY.format(version=version, pk=pk)
+            for pk in recipe_ids}
+
+
+def invalidate_fragments(recipe_ids):
+    if recipe_ids:
+        cache.delete_many(fragment_keys(recipe_ids).values())
+
+
+def recipes_changed(sender, **kwargs):
+    """Обработчик сигналов: сбросить кэш после коммита транзакции."""
+    if kwargs.get('action', 'post').startswith('pre_'):
+        return
+    transaction.on_commit(bump_recipes_version)
+
+
+def recipe_fragment_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_fragments([instance.pk]))
+
+
+def recipe_relation_changed(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: invalidate_fragments([recipe_id]))
+
+
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action.startswith('pre_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif pk_set is None:
+        catalog_changed()
+        return
+    else:
+        recipe_ids = list(pk_set)
+    transaction.on_commit(lambda: invalidate_fragments(recipe_ids))
+
+
+def catalog_changed(sender=None, **kwargs):
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+def author_changed(sender, instance, created=False, update_fields=None,
+                   **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if created or (update_fields is not None
+                   and set(update_fields) == {'last_login'}):
+        return
+    recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    transaction.on_commit(lambda: invalidate_fragments(recipe_ids))
@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+from hashlib import sha256
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Ingredient
+
+# Снимок каталога ингредиентов для автодополнения на клиенте. Файлы
+# с хешем содержимого в имени лежат в STATIC_ROOT/catalog/ и отдаются
+# nginx как неизменяемые; актуальная версия — в манифесте.
+
+CATALOG_DIR = 'catalog'
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_NAME = 'ingredients.{version}.json'
+SNAPSHOT_FIELDS = ('id', 'name', 'measurement_unit')
+BUILD_JOB = 'recipes.build_ingredient_catalog'
+# Через сколько секунд клиенту повторить запрос, пока снимка нет.
+RETRY_AFTER = 10
+
+
+def catalog_root():
+    return Path(settings.STATIC_ROOT) / CATALOG_DIR
+
+
+def write_atomic(path, content):
+    tmp = path.with_name(f'.{path.name}.tmp')
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def read_manifest():
+    try:
+        return json.loads((catalog_root() / MANIFEST_NAME).read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def build_snapshot():
+    """Записать снимок каталога и манифест, вернуть манифест.
+
+    Кроме текущего снимка хранится предыдущий: его могут ещё скачивать
+    клиенты со старым манифестом.
+    """
+    rows = list(Ingredient.objects.order_by('id').values_list(
+        *SNAPSHOT_FIELDS
+    ))
+    content = json.dumps(
+        {'fields': SNAPSHOT_FIELDS, 'rows': rows},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    version = sha256(content).hexdigest()[:16]
+    name = SNAPSHOT_NAME.format(version=version)
+    root = catalog_root()
+    root.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest()
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    write_atomic(root / name, content)
+    # Для gzip_static в nginx.
+    write_atomic(root / f'{name}.gz', compressed)
+    manifest = {
+        'version': version,
+        'path': f'{CATALOG_DIR}/{name}',
+        'count': len(rows),
+        'size': len(content),
+        'gzip_size': len(compressed),
+        'generated_at': timezone.now().isoformat(),
+    }
+    write_atomic(root / MANIFEST_NAME, json.dumps(manifest).encode())
+
+    keep = {name}
+    if previous is not None:
+        keep.add(Path(previous['path']).name)
+    for path in root.glob(SNAPSHOT_NAME.format(version='*')):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+            Path(f'{path}.gz').unlink(missing_ok=True)
+    return manifest
+
+
+def schedule_snapshot(delay=None):
+    from jobs.queue import enqueue
+    if delay is None:
+        delay = settings.INGREDIENT_CATALOG_DELAY
+    enqueue(BUILD_JOB, dedup_key=BUILD_JOB, delay=delay)
+
+
+def ingredients_changed(sender, **kwargs):
+    """Обработчик сигналов: пересобрать снимок в фоне после коммита.
+
+    Задача с ключом дедупликации одна на пачку изменений, например
+    на всю загрузку load_ingredients.
+    """
+    transaction.on_commit(schedule_snapshot)
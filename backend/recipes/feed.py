@@ -0,0 +1,60 @@
+from django.db import connection
+
+from users.models import Follow
+
+from .models import Recipe
+
+# На Postgres для каждого автора берётся не больше `limit` последних
+# рецептов по индексу (author, pub_date, id), после чего кандидаты
+# сливаются в одну ленту. Стоимость запроса ограничена
+# «подписки * limit», а не числом всех рецептов авторов.
+FAN_IN_SQL = """
+    SELECT r.id
+    FROM {follow} AS f
+    CROSS JOIN LATERAL (
+        SELECT id, pub_date
+        FROM {recipe}
+        WHERE author_id = f.author_id {position}
+        ORDER BY pub_date DESC, id DESC
+        LIMIT %s
+    ) AS r
+    WHERE f.user_id = %s
+    ORDER BY r.pub_date DESC, r.id DESC
+    LIMIT %s
+"""
+POSITION_SQL = 'AND (pub_date, id) < (%s, %s)'
+
+
+def get_feed_ids(user, position=None, limit=6):
+    """Id рецептов авторов из подписок, от новых к старым.
+
+    position — пара (pub_date, id) последнего рецепта предыдущей
+    страницы; в ленту попадают только более старые рецепты.
+    """
+    if connection.vendor == 'postgresql':
+        return _fan_in_ids(user, position, limit)
+    queryset = Recipe.objects.filter(
+        author__in=Follow.objects.filter(user=user).values('author')
+    )
+    if position is not None:
+        pub_date, pk = position
+        queryset = queryset.filter(
+            pub_date__lte=pub_date
+        ).exclude(pub_date=pub_date, id__gte=pk)
+    return list(
+        queryset.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )[:limit]
+    )
+
+
+def _fan_in_ids(user, position, limit):
+    sql = FAN_IN_SQL.format(
+        follow=Follow._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        position=POSITION_SQL if position is not None else '',
+    )
+    params = [*(position or ()), limit, user.pk, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,101 @@
+import json
+
+from django.core.exceptions import EmptyResultSet
+from django.db import models
+
+
+class ListField(models.Field):
+    """Список значений base_field.
+
+    В PostgreSQL — массив, под который строится GIN-индекс; в остальных
+    базах — JSON в текстовом столбце, его разбирает json_each.
+    """
+    empty_strings_allowed = False
+    description = 'Список'
+
+    def __init__(self, base_field, **kwargs):
+        self.base_field = base_field
+        kwargs.setdefault('default', list)
+        kwargs.setdefault('editable', False)
+        super().__init__(**kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['base_field'] = self.base_field.clone()
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return f'{self.base_field.db_type(connection)}[]'
+        return 'text'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        value = [self.base_field.get_prep_value(item) for item in value]
+        if connection.vendor == 'postgresql':
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj), ensure_ascii=False)
+
+
+class ListLookup(models.Lookup):
+    """Сравнение списка со списком значений: оператор массивов
+    PostgreSQL или подзапрос к json_each."""
+    prepare_rhs = False
+    operator = None
+
+    def values(self):
+        base_field = self.lhs.output_field.base_field
+        return list(dict.fromkeys(
+            base_field.get_prep_value(value) for value in self.rhs
+        ))
+
+    def as_postgresql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        db_type = self.lhs.output_field.db_type(connection)
+        return (f'{lhs} {self.operator} %s::{db_type}',
+                [*params, self.values()])
+
+
+@ListField.register_lookup
+class Overlap(ListLookup):
+    """Есть хотя бы одно из значений."""
+    lookup_name = 'overlap'
+    operator = '&&'
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        values = self.values()
+        if not values:
+            raise EmptyResultSet
+        placeholders = ', '.join(['%s'] * len(values))
+        return (f'EXISTS (SELECT 1 FROM json_each({lhs}) '
+                f'WHERE value IN ({placeholders}))', [*params, *values])
+
+
+@ListField.register_lookup
+class Contains(ListLookup):
+    """Есть все значения."""
+    lookup_name = 'contains'
+    operator = '@>'
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        values = self.values()
+        if not values:
+            return '1 = 1', []
+        placeholders = ', '.join(['%s'] * len(values))
+        return (f'(SELECT COUNT(DISTINCT value) FROM json_each({lhs}) '
+                f'WHERE value IN ({placeholders})) = %s',
+                [*params, *values, len(values)])
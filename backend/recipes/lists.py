@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from .models import IngredientToRecipe, Recipe, Tag, TagToRecipe
+
+LIST_FIELDS = ('tag_ids', 'tag_slugs', 'ingredient_ids', 'ingredients_count')
+
+
+def list_values(tags, ingredient_ids):
+    """Значения LIST_FIELDS по парам (id, слаг) тегов и id ингредиентов."""
+    tags = sorted(tags)
+    return {
+        'tag_ids': [tag_id for tag_id, _ in tags],
+        'tag_slugs': [slug for _, slug in tags],
+        'ingredient_ids': sorted(set(ingredient_ids)),
+        'ingredients_count': len(ingredient_ids),
+    }
+
+
+def refresh_lists(recipe_ids, batch_size=500):
+    """Пересчитать списки тегов и ингредиентов рецептов по связям.
+
+    Вызывается в транзакции, которая меняет связи, чтобы фильтры
+    не видели рецепт с устаревшими списками.
+    """
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        tags = defaultdict(list)
+        for recipe_id, tag_id, slug in TagToRecipe.objects.filter(
+            recipe__in=batch
+        ).values_list('recipe_id', 'tag_id', 'tag__slug'):
+            tags[recipe_id].append((tag_id, slug))
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in IngredientToRecipe.objects.filter(
+            recipe__in=batch
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        Recipe.objects.bulk_update([
+            Recipe(pk=pk, **list_values(tags[pk], ingredients[pk]))
+            for pk in batch
+        ], LIST_FIELDS)
+
+
+def refresh_tag(tag_id):
+    refresh_lists(Recipe.objects.filter(
+        tag_ids__contains=[tag_id]
+    ).values_list('id', flat=True))
+
+
+def tag_slug_saving(sender, instance, raw=False, update_fields=None,
+                    **kwargs):
+    """Обработчик pre_save: запомнить прежний слаг тега."""
+    instance._old_slug = None
+    if (raw or instance._state.adding
+            or update_fields is not None and 'slug' not in update_fields):
+        return
+    instance._old_slug = Tag.objects.filter(pk=instance.pk).values_list(
+        'slug', flat=True
+    ).first()
+
+
+def tag_slug_saved(sender, instance, created=False, **kwargs):
+    """Обработчик post_save: пересчитать списки, если слаг изменился."""
+    old = getattr(instance, '_old_slug', None)
+    if created or old is None or old == instance.slug:
+        return
+    refresh_tag(instance.pk)
+
+
+def tag_deleted(sender, instance, **kwargs):
+    refresh_tag(instance.pk)
+
+
+def ingredient_deleted(sender, instance, **kwargs):
+    refresh_lists(Recipe.objects.filter(
+        ingredient_ids__contains=[instance.pk]
+    ).values_list('id', flat=True))
@@ -0,0 +1,95 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import get_feed_ids
+from recipes.models import Recipe
+from users.models import Follow, User
+
+BENCH_PREFIX = 'bench_feed'
+
+
+class Rollback(Exception):
+    """Откат тестовых данных после замеров."""
+
+
+class Command(BaseCommand):
+    """Замер ленты подписок для 10, 1 000 и 10 000 авторов."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', nargs='+', type=int,
+                            default=[10, 1000, 10000])
+        parser.add_argument('--recipes-per-author', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for authors in options['authors']:
+            try:
+                with transaction.atomic():
+                    self.bench(authors, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def bench(self, authors, options):
+        follower = self.seed(authors, options['recipes_per_author'])
+        limit = options['limit']
+        first_page = self.measure(
+            lambda: get_feed_ids(follower, None, limit + 1),
+            options['repeat']
+        )
+
+        def walk():
+            position = None
+            for _ in range(options['pages']):
+                ids = get_feed_ids(follower, position, limit + 1)[:limit]
+                if not ids:
+                    break
+                recipe = Recipe.objects.only('pub_date').get(pk=ids[-1])
+                position = (recipe.pub_date, recipe.pk)
+
+        pages = self.measure(walk, options['repeat'])
+        self.stdout.write(
+            f'авторов: {authors:>6}  '
+            f'первая страница: {first_page * 1000:8.2f} мс  '
+            f'{options["pages"]} страниц: {pages * 1000:8.2f} мс'
+        )
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            timings.append(perf_counter() - start)
+        return median(timings)
+
+    @staticmethod
+    def seed(authors, recipes_per_author):
+        follower = User.objects.create(
+            username=f'{BENCH_PREFIX}_follower',
+            email=f'{BENCH_PREFIX}_follower@example.com',
+        )
+        User.objects.bulk_create(
+            User(username=f'{BENCH_PREFIX}_{i}',
+                 email=f'{BENCH_PREFIX}_{i}@example.com')
+            for i in range(authors)
+        )
+        users = User.objects.filter(
+            username__startswith=f'{BENCH_PREFIX}_'
+        ).exclude(pk=follower.pk)
+        Follow.objects.bulk_create(
+            Follow(user=follower, author=author) for author in users
+        )
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'{author.username} {i}',
+                    text='-', cooking_time=1,
+                    image='recipes/image/bench.jpg')
+             for author in users for i in range(recipes_per_author)),
+            batch_size=1000
+        )
+        return follower
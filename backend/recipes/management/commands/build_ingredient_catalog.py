@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import build_snapshot
+
+
+class Command(BaseCommand):
+    """Собрать снимок каталога ингредиентов в STATIC_ROOT/catalog/."""
+
+    def handle(self, *args, **options):
+        manifest = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'{manifest["path"]}: {manifest["count"]} ингредиентов, '
+            f'{manifest["size"]} байт, gzip {manifest["gzip_size"]} байт.'
+        ))
@@ -0,0 +1,64 @@
+import os
+from itertools import islice
+from time import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.media import is_fresh, referenced
+
+
+def walk(root, prefix=''):
+    """Файлы под root по одному: (имя относительно root, путь)."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            name = f'{prefix}{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(entry.path, f'{name}/')
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.path
+
+
+def batches(items, size):
+    items = iter(items)
+    while batch := dict(islice(items, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    """Удалить из MEDIA_ROOT файлы, на которые не ссылается ни одна запись.
+
+    Каталог читается потоком, ссылки проверяются одним запросом на пачку
+    файлов. Файлы моложе MEDIA_GC_GRACE секунд не трогаются.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено.')
+
+    def handle(self, *args, **options):
+        root = settings.MEDIA_ROOT
+        if not os.path.isdir(root):
+            self.stdout.write(f'{root} не существует.')
+            return
+        now = time()
+        checked = removed = freed = 0
+        for batch in batches(walk(root), options['batch_size']):
+            checked += len(batch)
+            kept = referenced(batch)
+            for name, path in batch.items():
+                if name in kept or is_fresh(path, now):
+                    continue
+                size = os.path.getsize(path)
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    os.remove(path)
+                removed += 1
+                freed += size
+        verb = 'будет удалено' if options['dry_run'] else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {checked}, {verb}: {removed} '
+            f'({freed} байт).'
+        ))
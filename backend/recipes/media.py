@@ -0,0 +1,75 @@
+import os
+from time import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+
+from .models import Recipe
+
+# Файлы называются по содержимому (foodgram.storage.ContentHashStorage),
+# поэтому один файл может принадлежать нескольким рецептам. Ссылки
+# считаются по базе: файл удаляется, когда на него не ссылается ни одна
+# запись.
+
+
+def file_fields():
+    """Все (модель, поле) с файлами в default_storage."""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+        and field.storage is default_storage
+    ]
+
+
+def referenced(names):
+    """Имена из names, на которые ссылается хотя бы одна запись."""
+    names = list(names)
+    found = set()
+    for model, field in file_fields():
+        found.update(model._base_manager.filter(
+            **{f'{field.name}__in': names}
+        ).values_list(field.name, flat=True))
+    return found
+
+
+def is_fresh(path, now=None):
+    """Файл изменён меньше MEDIA_GC_GRACE секунд назад.
+
+    Такой файл мог только что загрузить параллельный запрос, ссылка
+    на него ещё не закоммичена.
+    """
+    try:
+        modified = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return True
+    return modified > (now or time()) - settings.MEDIA_GC_GRACE
+
+
+def release_file(name):
+    """Удалить файл, если на него больше не ссылается ни одна запись."""
+    if not name or referenced([name]):
+        return False
+    if is_fresh(default_storage.path(name)):
+        return False
+    default_storage.delete(name)
+    return True
+
+
+def recipe_image_replaced(sender, instance, raw=False, **kwargs):
+    """Обработчик pre_save: освободить прежнюю картинку рецепта."""
+    if raw or instance._state.adding:
+        return
+    old = Recipe.objects.filter(pk=instance.pk).values_list(
+        'image', flat=True
+    ).first()
+    if old and old != instance.image.name:
+        transaction.on_commit(lambda: release_file(old))
+
+
+def recipe_image_deleted(sender, instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: release_file(name))
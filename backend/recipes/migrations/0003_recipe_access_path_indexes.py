@@ -0,0 +1,21 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagtorecipe',
+            index=models.Index(fields=['recipe', 'tag'], name='tagtorecipe_recipe_tag_idx'),
+        ),
+    ]
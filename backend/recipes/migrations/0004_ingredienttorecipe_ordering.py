@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:14
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredienttorecipe',
+            options={'ordering': ('id',), 'verbose_name': 'Ингридиент', 'verbose_name_plural': 'Ингридиенты'},
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:02
+
+from django.db import migrations, models
+import recipes.fields
+
+LIST_COLUMNS = ('tag_ids', 'tag_slugs', 'ingredient_ids')
+
+# Заполнение списков по существующим связям одним UPDATE.
+FILL_SQL = {
+    'postgresql': """
+        UPDATE recipes_recipe SET
+            tag_ids = ARRAY(
+                SELECT tag_id FROM recipes_tagtorecipe
+                WHERE recipe_id = recipes_recipe.id ORDER BY tag_id
+            ),
+            tag_slugs = ARRAY(
+                SELECT tag.slug FROM recipes_tagtorecipe link
+                JOIN recipes_tag tag ON tag.id = link.tag_id
+                WHERE link.recipe_id = recipes_recipe.id
+                ORDER BY link.tag_id
+            ),
+            ingredient_ids = ARRAY(
+                SELECT DISTINCT ingredient_id
+                FROM recipes_ingredienttorecipe
+                WHERE recipe_id = recipes_recipe.id ORDER BY ingredient_id
+            ),
+            ingredients_count = (
+                SELECT COUNT(*) FROM recipes_ingredienttorecipe
+                WHERE recipe_id = recipes_recipe.id
+            )
+    """,
+    'sqlite': """
+        UPDATE recipes_recipe SET
+            tag_ids = (SELECT json_group_array(tag_id) FROM (
+                SELECT tag_id FROM recipes_tagtorecipe
+                WHERE recipe_id = recipes_recipe.id ORDER BY tag_id
+            )),
+            tag_slugs = (SELECT json_group_array(slug) FROM (
+                SELECT tag.slug FROM recipes_tagtorecipe link
+                JOIN recipes_tag tag ON tag.id = link.tag_id
+                WHERE link.recipe_id = recipes_recipe.id
+                ORDER BY link.tag_id
+            )),
+            ingredient_ids = (SELECT json_group_array(ingredient_id) FROM (
+                SELECT DISTINCT ingredient_id
+                FROM recipes_ingredienttorecipe
+                WHERE recipe_id = recipes_recipe.id ORDER BY ingredient_id
+            )),
+            ingredients_count = (
+                SELECT COUNT(*) FROM recipes_ingredienttorecipe
+                WHERE recipe_id = recipes_recipe.id
+            )
+    """,
+}
+
+
+def fill_lists(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor in FILL_SQL:
+        schema_editor.execute(FILL_SQL[vendor])
+    if vendor == 'postgresql':
+        # GIN-индексы массивов для операторов && и @>. В других базах
+        # списки хранятся в JSON, и индекс по ним не поможет.
+        for column in LIST_COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX recipe_{column}_gin ON recipes_recipe '
+                f'USING gin ({column})'
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for column in LIST_COLUMNS:
+            schema_editor.execute(f'DROP INDEX recipe_{column}_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_change_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=recipes.fields.ListField(base_field=models.BigIntegerField(), default=list, editable=False, verbose_name='id ингредиентов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Число ингредиентов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=recipes.fields.ListField(base_field=models.BigIntegerField(), default=list, editable=False, verbose_name='id тегов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_slugs',
+            field=recipes.fields.ListField(base_field=models.SlugField(max_length=100), default=list, editable=False, verbose_name='Слаги тегов'),
+        ),
+        migrations.RunPython(fill_lists, drop_indexes),
+    ]
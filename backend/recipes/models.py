@@ -4,6 +4,7 @@ from django.db import models
 from django.db.models import Exists, OuterRef
 
 from users.models import Follow, User  # noqa
+from .fields import ListField
 
 MAX_NAME_LENGTH = 100
 MAX_COLOR_LENGTH = 7
@@ -95,6 +96,24 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+
+    # Копии связей для фильтров без JOIN, их пересчитывает
+    # recipes.lists.refresh_lists. tag_slugs идут в порядке tag_ids.
+    tag_ids = ListField(models.BigIntegerField(), verbose_name='id тегов')
+    tag_slugs = ListField(
+        models.SlugField(max_length=MAX_SLUG_LENGTH),
+        verbose_name='Слаги тегов'
+    )
+    ingredient_ids = ListField(
+        models.BigIntegerField(), verbose_name='id ингредиентов'
+    )
+    ingredients_count = models.PositiveSmallIntegerField(
+        'Число ингредиентов', default=0, editable=False
+    )
 
     objects = RecipeQuerySet.as_manager()
 
@@ -102,6 +121,17 @@ class Recipe(models.Model):
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date', 'name', )
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['name', 'id'],
+                name='recipe_name_id_idx'
+            ),
+            models.Index(fields=['image'], name='recipe_image_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -125,6 +155,12 @@ class TagToRecipe(models.Model):
                 name='unique_tag_recipe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'tag'],
+                name='tagtorecipe_recipe_tag_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.tag} и {self.recipe}'
@@ -143,6 +179,10 @@ class FavoriteShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True
+    )
 
     class Meta:
         abstract = True
@@ -212,6 +252,7 @@ class IngredientToRecipe(models.Model):
     class Meta:
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
+        ordering = ('id',)
         constraints = [
             models.UniqueConstraint(
                 fields=['ingredient', 'recipe'],
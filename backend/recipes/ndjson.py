@@ -0,0 +1,39 @@
+import bz2
+import gzip
+import json
+import lzma
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Выгрузки и загрузки в NDJSON: объект в строке, сжатие по расширению.
+OPENERS = {
+    '.gz': lambda path, mode: gzip.open(path, mode, compresslevel=6),
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+}
+
+
+def open_file(path, mode):
+    """Открыть файл в двоичном режиме mode со сжатием по расширению."""
+    for suffix, opener in OPENERS.items():
+        if str(path).endswith(suffix):
+            return opener(path, mode)
+    return open(path, mode)
+
+
+def dumps(record):
+    if orjson is not None:
+        return orjson.dumps(record) + b'\n'
+    return json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False,
+                      separators=(',', ':')).encode() + b'\n'
+
+
+def loads(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
@@ -0,0 +1,50 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+
+from users.models import User
+
+from .cache import (author_changed, catalog_changed, recipe_fragment_changed,
+                    recipe_relation_changed, recipe_tags_changed,
+                    recipes_changed)
+from .catalog import ingredients_changed
+from .lists import (ingredient_deleted, tag_deleted, tag_slug_saved,
+                    tag_slug_saving)
+from .media import recipe_image_deleted, recipe_image_replaced
+from .models import Ingredient, IngredientToRecipe, Recipe, Tag, TagToRecipe
+
+RECIPE_DATA_MODELS = (Recipe, TagToRecipe, IngredientToRecipe,
+                      Tag, Ingredient)
+
+
+def connect_signals():
+    for model in RECIPE_DATA_MODELS:
+        post_save.connect(recipes_changed, sender=model)
+        post_delete.connect(recipes_changed, sender=model)
+    # recipe.tags.set() не вызывает post_save у TagToRecipe.
+    m2m_changed.connect(recipes_changed, sender=Recipe.tags.through)
+
+    # Кэш фрагментов сбрасывается точечно, по id рецепта.
+    for signal in (post_save, post_delete):
+        signal.connect(recipe_fragment_changed, sender=Recipe)
+        signal.connect(recipe_relation_changed, sender=TagToRecipe)
+        signal.connect(recipe_relation_changed, sender=IngredientToRecipe)
+        signal.connect(catalog_changed, sender=Tag)
+        signal.connect(catalog_changed, sender=Ingredient)
+    m2m_changed.connect(recipe_tags_changed, sender=Recipe.tags.through)
+    post_save.connect(author_changed, sender=User)
+
+    # Снимок каталога ингредиентов для клиентов.
+    post_save.connect(ingredients_changed, sender=Ingredient)
+    post_delete.connect(ingredients_changed, sender=Ingredient)
+
+    # Списки тегов и ингредиентов рецептов: связи пересчитывают те,
+    # кто их меняет, здесь — переименование и удаление тегов и
+    # ингредиентов.
+    pre_save.connect(tag_slug_saving, sender=Tag)
+    post_save.connect(tag_slug_saved, sender=Tag)
+    post_delete.connect(tag_deleted, sender=Tag)
+    post_delete.connect(ingredient_deleted, sender=Ingredient)
+
+    # Картинки без ссылок удаляются после коммита.
+    pre_save.connect(recipe_image_replaced, sender=Recipe)
+    post_delete.connect(recipe_image_deleted, sender=Recipe)
@@ -0,0 +1,8 @@
+from jobs.queue import task
+
+from .catalog import BUILD_JOB, build_snapshot
+
+
+@task(BUILD_JOB)
+def build_ingredient_catalog():
+    build_snapshot()
@@ -1,12 +1,28 @@
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as BaseUserManager
 from django.db import models
+from django.db.models import Exists, OuterRef
 
 from users.validator import validate_username
 
 MAX_LENGTH = 150
 
 
+class UserQuerySet(models.QuerySet):
+    def with_is_subscribed(self, user):
+        """Аннотация is_subscribed: подписан ли user на пользователя."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('pk'))
+        ))
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     """Модель пользователя"""
     email = models.EmailField(
@@ -39,6 +55,8 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
 
+    objects = UserManager()
+
     class Meta:
         ordering = ('last_name', 'first_name',)
         verbose_name = 'Пользователь'
@@ -60,6 +78,10 @@ class Follow(models.Model):
         related_name='followers',
         verbose_name='Автор'
     )
+    created = models.DateTimeField(
+        verbose_name='Дата подписки',
+        auto_now_add=True
+    )
 
     class Meta:
         verbose_name = 'Подписка'